@@ -1,17 +1,30 @@
+import argparse
+import asyncio
 import json
+import logging
+import os
+import signal
+from concurrent.futures import ThreadPoolExecutor
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from typing import Any, Dict
+from typing import Any, Dict, Tuple
 
 from csao import CSAOConfig, CSAOEngine
+from csao.cooccurrence_builder import load_cooccurrence
 from csao.data import sample_cooccurrence, sample_items, sample_users
 from csao.service import CSAOService
 from csao.storage import FeedbackStore
+from csao.tracing import Tracer
+
+COOCCURRENCE_PATH = "artifacts/csao_cooccurrence.csv"
+
+logger = logging.getLogger("csao.app")
 
 
 def build_service() -> CSAOService:
     items = sample_items()
     users = sample_users()
-    cooc = sample_cooccurrence()
+    # Strengths from build_cooccurrence.py when available, else the hand-coded sample.
+    cooc = load_cooccurrence(COOCCURRENCE_PATH) if os.path.exists(COOCCURRENCE_PATH) else sample_cooccurrence()
     engine = CSAOEngine(
         items=items,
         users=users,
@@ -20,62 +33,283 @@ def build_service() -> CSAOService:
         model_path="artifacts/csao_logistic.json",
     )
     store = FeedbackStore("artifacts/csao.db")
-    return CSAOService(engine=engine, store=store)
+    service = CSAOService(engine=engine, store=store)
+    service.warm_start_bandit()
+    service.start_bandit_snapshots(interval_s=60.0)
+    engine.start_model_watch(interval_s=5.0)
+    return service
 
 
 SERVICE = build_service()
 
 
+def handle_post(path: str, raw: bytes) -> Tuple[int, Dict[str, Any]]:
+    try:
+        payload = json.loads(raw.decode("utf-8") or "{}")
+    except Exception:
+        return 400, {"error": "invalid_json"}
+
+    if path == "/recommend":
+        try:
+            return 200, SERVICE.recommend(payload)
+        except KeyError as exc:
+            return 400, {"error": "missing_field", "field": str(exc)}
+
+    if path == "/recommend/batch":
+        try:
+            return 200, SERVICE.recommend_batch(payload)
+        except KeyError as exc:
+            return 400, {"error": "missing_field", "field": str(exc)}
+
+    if path == "/admin/model/reload":
+        try:
+            return 200, SERVICE.reload_model(payload)
+        except (OSError, ValueError, KeyError, TypeError):
+            # Details stay in the server log; echoing them would reveal which files exist.
+            logger.warning("model reload failed", exc_info=True)
+            return 400, {"error": "model_reload_failed"}
+
+    if path == "/admin/model/rollback":
+        try:
+            return 200, SERVICE.rollback_model()
+        except ValueError as exc:
+            return 400, {"error": "model_rollback_failed", "detail": str(exc)}
+
+    if path == "/admin/profile":
+        try:
+            return 200, SERVICE.profile(payload)
+        except (ValueError, TypeError) as exc:
+            return 400, {"error": "bad_profile_request", "detail": str(exc)}
+        except RuntimeError as exc:
+            return 400, {"error": "profile_running", "detail": str(exc)}
+
+    if path == "/feedback/accept":
+        try:
+            return 200, SERVICE.accept(payload)
+        except KeyError as exc:
+            return 400, {"error": "missing_field", "field": str(exc)}
+
+    return 404, {"error": "not_found"}
+
+
+def handle_get(path: str) -> Tuple[int, Dict[str, Any] | str]:
+    if path == "/metrics":
+        return 200, SERVICE.metrics()
+    if path == "/health":
+        return 200, {"ok": True, "model_version": SERVICE.engine.model_version}
+    if path == "/stats":
+        return 200, SERVICE.stats()
+    return 404, {"error": "not_found"}
+
+
+def dispatch(method: str, path: str, raw: bytes = b"") -> Tuple[int, Dict[str, Any] | str]:
+    # Bad input that slips past the per-route checks (wrong types, a JSON list body) is a
+    # 400; anything else is a bug, logged here so the connection is never dropped silently.
+    try:
+        if method == "GET":
+            return handle_get(path)
+        if method == "POST":
+            return handle_post(path, raw)
+        return 405, {"error": "method_not_allowed"}
+    except (KeyError, ValueError, TypeError, AttributeError) as exc:
+        return 400, {"error": "bad_request", "detail": type(exc).__name__}
+    except Exception:
+        logger.exception("unhandled error in %s %s", method, path)
+        return 500, {"error": "internal_error"}
+
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _encode(payload: Dict[str, Any] | str) -> Tuple[bytes, str]:
+    # Plain strings are the Prometheus text from /metrics; everything else is JSON.
+    if isinstance(payload, str):
+        return payload.encode("utf-8"), METRICS_CONTENT_TYPE
+    return json.dumps(payload).encode("utf-8"), "application/json"
+
+
 class Handler(BaseHTTPRequestHandler):
-    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
-        body = json.dumps(payload).encode("utf-8")
+    def _send_json(self, status: int, payload: Dict[str, Any] | str) -> None:
+        body, content_type = _encode(payload)
         self.send_response(status)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
         self.send_header("Content-Length", str(len(body)))
         self.end_headers()
         self.wfile.write(body)
 
     def do_GET(self) -> None:
-        if self.path == "/health":
-            self._send_json(200, {"ok": True})
-            return
-        self._send_json(404, {"error": "not_found"})
+        self._send_json(*dispatch("GET", self.path))
 
     def do_POST(self) -> None:
         try:
             length = int(self.headers.get("Content-Length", "0"))
             raw = self.rfile.read(length)
-            payload = json.loads(raw.decode("utf-8") or "{}")
         except Exception:
             self._send_json(400, {"error": "invalid_json"})
             return
+        self._send_json(*dispatch("POST", self.path, raw))
 
-        if self.path == "/recommend":
-            try:
-                out = SERVICE.recommend(payload)
-                self._send_json(200, out)
-                return
-            except KeyError as exc:
-                self._send_json(400, {"error": "missing_field", "field": str(exc)})
-                return
-
-        if self.path == "/feedback/accept":
-            try:
-                out = SERVICE.accept(payload)
-                self._send_json(200, out)
-                return
-            except KeyError as exc:
-                self._send_json(400, {"error": "missing_field", "field": str(exc)})
-                return
 
-        self._send_json(404, {"error": "not_found"})
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _response(status: int, payload: Dict[str, Any] | str, keep_alive: bool) -> bytes:
+    body, content_type = _encode(payload)
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+class AsyncServer:
+    # HTTP/1.1 with persistent connections on one event loop. Only CPU-bound POST work
+    # leaves the loop, and at most max_inflight of it runs at once on a fixed-size pool.
+    def __init__(
+        self,
+        *,
+        workers: int = 8,
+        max_inflight: int = 64,
+        max_connections: int = 1024,
+        idle_timeout_s: float = 15.0,
+        max_body_bytes: int = 1 << 20,
+    ):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="csao-worker")
+        self.max_inflight = max_inflight
+        self.max_connections = max_connections
+        self.idle_timeout_s = idle_timeout_s
+        self.max_body_bytes = max_body_bytes
+        self._connections = 0
+        self._inflight: asyncio.Semaphore | None = None
+
+    async def serve(self, host: str, port: int) -> None:
+        self._inflight = asyncio.Semaphore(self.max_inflight)
+        server = await asyncio.start_server(self._handle, host, port, backlog=1024)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self._connections >= self.max_connections:
+            writer.write(_response(503, {"error": "overloaded"}, keep_alive=False))
+            await self._close(writer)
+            return
+
+        self._connections += 1
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), self.idle_timeout_s)
+                if not request_line.strip():
+                    break
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    writer.write(_response(400, {"error": "bad_request"}, keep_alive=False))
+                    break
+                method, path, version = parts
+
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout_s)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                conn_hdr = headers.get("connection", "").lower()
+                keep_alive = conn_hdr == "keep-alive" if version == "HTTP/1.0" else conn_hdr != "close"
+
+                try:
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    writer.write(_response(400, {"error": "bad_content_length"}, keep_alive=False))
+                    break
+                if length > self.max_body_bytes:
+                    writer.write(_response(413, {"error": "payload_too_large"}, keep_alive=False))
+                    break
+                # A client that announces a body and then stalls must not hold a connection slot.
+                raw = await asyncio.wait_for(reader.readexactly(length), self.idle_timeout_s) if length else b""
+
+                if method == "POST":
+                    async with self._inflight:
+                        loop = asyncio.get_running_loop()
+                        status, payload = await loop.run_in_executor(self.executor, dispatch, method, path, raw)
+                else:
+                    status, payload = dispatch(method, path)
+
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # Transport errors only (ValueError is readline's over-long line); handler errors
+            # already became responses in dispatch().
+            pass
+        finally:
+            self._connections -= 1
+            await self._close(writer)
+
+    @staticmethod
+    async def _close(writer: asyncio.StreamWriter) -> None:
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+def _interrupt(signum: int, frame: Any) -> None:
+    raise KeyboardInterrupt
 
 
 def run() -> None:
-    server = ThreadingHTTPServer(("0.0.0.0", 8000), Handler)
-    print("CSAO API running on http://0.0.0.0:8000")
-    print("Endpoints: GET /health, POST /recommend, POST /feedback/accept")
-    server.serve_forever()
+    parser = argparse.ArgumentParser(description="CSAO API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--server", choices=["asyncio", "threaded"], default="asyncio")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Executor size for /recommend work")
+    parser.add_argument("--max-inflight", type=int, default=64, help="Max concurrent requests in the executor")
+    parser.add_argument("--max-connections", type=int, default=1024)
+    parser.add_argument("--trace-sample-rate", type=float, default=0.0, help="Fraction of requests to trace")
+    parser.add_argument("--trace-slow-ms", type=float, default=None, help="Also trace every request slower than this")
+    parser.add_argument("--trace-path", default="artifacts/traces/csao_traces.jsonl")
+    args = parser.parse_args()
+
+    if args.trace_sample_rate > 0 or args.trace_slow_ms is not None:
+        SERVICE.engine.enable_tracing(
+            Tracer(args.trace_path, sample_rate=args.trace_sample_rate, slow_ms=args.trace_slow_ms)
+        )
+
+    # Orchestrators stop us with SIGTERM; treat it like Ctrl-C so queued feedback is flushed.
+    signal.signal(signal.SIGTERM, _interrupt)
+
+    print(f"CSAO API running on http://{args.host}:{args.port} ({args.server})")
+    print("Endpoints: GET /health, GET /stats, GET /metrics, POST /recommend, POST /recommend/batch, POST /feedback/accept")
+    print("Admin: POST /admin/model/reload, POST /admin/model/rollback, POST /admin/profile")
+    try:
+        if args.server == "threaded":
+            server = ThreadingHTTPServer((args.host, args.port), Handler)
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+        else:
+            aio = AsyncServer(
+                workers=args.workers,
+                max_inflight=args.max_inflight,
+                max_connections=args.max_connections,
+            )
+            try:
+                asyncio.run(aio.serve(args.host, args.port))
+            finally:
+                aio.executor.shutdown(wait=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        SERVICE.close()
 
 
 if __name__ == "__main__":
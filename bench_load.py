@@ -0,0 +1,226 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+from urllib.parse import urlparse
+
+from csao import CSAOConfig, CSAOEngine
+from csao.data import sample_cooccurrence, sample_items, sample_users
+from csao.service import CSAOService
+from csao.storage import FeedbackStore
+
+TIMES = ["breakfast", "lunch", "dinner"]
+CUISINES = ["hyderabadi", "indian", "mughlai"]
+PERCENTILES = [50.0, 95.0, 99.0, 99.9]
+
+
+def synthetic_corpus(n: int, seed: int = 7) -> List[Dict[str, object]]:
+    rnd = random.Random(seed)
+    item_ids = list(sample_items())
+    user_ids = list(sample_users()) + [f"u_new_{i}" for i in range(5)]
+    corpus = []
+    for _ in range(n):
+        corpus.append(
+            {
+                "user_id": rnd.choice(user_ids),
+                "restaurant_id": f"r_{rnd.randint(1, 50)}",
+                "city": rnd.choice(["Hyderabad", "Bengaluru"]),
+                "time_of_day": rnd.choice(TIMES),
+                "restaurant_cuisine": rnd.choice(CUISINES),
+                "cart_item_ids": rnd.sample(item_ids, rnd.randint(1, 3)),
+                "top_k": 8,
+            }
+        )
+    return corpus
+
+
+def load_corpus(path: str) -> List[Dict[str, object]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def inproc_sender() -> Tuple[Callable[[Dict[str, object]], bool], Callable[[], None]]:
+    # Same wiring as app.build_service, but feedback goes to a throwaway database.
+    tmp = tempfile.mkdtemp(prefix="csao-bench-")
+    engine = CSAOEngine(
+        items=sample_items(),
+        users=sample_users(),
+        cooccurrence=sample_cooccurrence(),
+        cfg=CSAOConfig(top_k=8),
+        model_path="artifacts/csao_logistic.json",
+    )
+    service = CSAOService(engine=engine, store=FeedbackStore(os.path.join(tmp, "bench.db")))
+
+    def send(payload: Dict[str, object]) -> bool:
+        service.recommend(payload)
+        return True
+
+    return send, service.close
+
+
+def http_sender(url: str) -> Tuple[Callable[[Dict[str, object]], bool], Callable[[], None]]:
+    # One keep-alive connection per client thread.
+    parsed = urlparse(url)
+    local = threading.local()
+    headers = {"Content-Type": "application/json"}
+
+    def send(payload: Dict[str, object]) -> bool:
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+        try:
+            conn.request("POST", parsed.path or "/recommend", json.dumps(payload), headers)
+            resp = conn.getresponse()
+            resp.read()
+            return resp.status == 200
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            local.conn = None
+            return False
+
+    return send, lambda: None
+
+
+def replay(
+    send: Callable[[Dict[str, object]], bool],
+    corpus: List[Dict[str, object]],
+    *,
+    total: int,
+    concurrency: int,
+    rate: float | None,
+) -> Dict[str, object]:
+    # Closed loop when rate is None: each client sends as soon as its last reply arrives.
+    # Open loop otherwise: request i is due at start + i / rate and its latency is measured
+    # from that due time, so a stalled server shows up as queueing instead of being hidden.
+    lock = threading.Lock()
+    next_index = [0]
+    latencies: List[float] = []
+    errors = [0]
+    start = time.perf_counter()
+
+    def client() -> None:
+        local_lat: List[float] = []
+        local_err = 0
+        while True:
+            with lock:
+                i = next_index[0]
+                next_index[0] += 1
+            if i >= total:
+                break
+            if rate is not None:
+                due = start + i / rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                t0 = due
+            else:
+                t0 = time.perf_counter()
+            try:
+                ok = send(corpus[i % len(corpus)])
+            except Exception:
+                ok = False
+            local_lat.append(time.perf_counter() - t0)
+            if not ok:
+                local_err += 1
+        with lock:
+            latencies.extend(local_lat)
+            errors[0] += local_err
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    n = len(latencies)
+
+    def pct(p: float) -> float:
+        # Nearest-rank percentile in milliseconds.
+        if not n:
+            return 0.0
+        k = max(0, min(n - 1, int(-(-p * n // 100)) - 1))
+        return latencies[k] * 1000.0
+
+    return {
+        "requests": n,
+        "errors": errors[0],
+        "error_rate": errors[0] / n if n else 0.0,
+        "elapsed_s": elapsed,
+        "throughput_rps": n / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {
+            **{f"p{p:g}": pct(p) for p in PERCENTILES},
+            "mean": sum(latencies) / n * 1000.0 if n else 0.0,
+            "max": latencies[-1] * 1000.0 if n else 0.0,
+        },
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], check=True, capture_output=True, text=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recommend traffic and report latency percentiles")
+    parser.add_argument("--target", choices=["inproc", "http"], default="inproc")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/recommend", help="Endpoint for --target http")
+    parser.add_argument("--corpus", default=None, help="JSONL of /recommend payloads (default: synthetic carts)")
+    parser.add_argument("--synthetic", type=int, default=1000, help="Synthetic corpus size when --corpus is not given")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--write-corpus", default=None, help="Save the corpus used, for replaying the same traffic later")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests to send (the corpus is cycled)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads")
+    parser.add_argument("--rate", type=float, default=None, help="Open-loop requests/s; omit for closed loop")
+    parser.add_argument("--warmup", type=int, default=200, help="Unrecorded requests sent first")
+    parser.add_argument("--out", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.synthetic, args.seed)
+    if not corpus:
+        parser.error("empty corpus")
+    if args.write_corpus:
+        with open(args.write_corpus, "w", encoding="utf-8") as f:
+            for payload in corpus:
+                f.write(json.dumps(payload) + "\n")
+
+    send, close = inproc_sender() if args.target == "inproc" else http_sender(args.url)
+    try:
+        if args.warmup:
+            replay(send, corpus, total=args.warmup, concurrency=args.concurrency, rate=None)
+        result = replay(send, corpus, total=args.requests, concurrency=args.concurrency, rate=args.rate)
+    finally:
+        close()
+
+    lat = result["latency_ms"]
+    mode = f"open loop {args.rate:g} rps" if args.rate else "closed loop"
+    print(f"{args.target} ({mode}, concurrency={args.concurrency}): {result['throughput_rps']:.1f} req/s, errors={result['error_rate']:.2%}")
+    print("latency ms: " + " ".join(f"{k}={v:.2f}" for k, v in lat.items()))
+
+    if args.out:
+        report = {
+            "commit": _git_commit(),
+            "target": args.target,
+            "url": args.url if args.target == "http" else None,
+            "corpus": args.corpus or f"synthetic:{args.synthetic}:seed={args.seed}",
+            "mode": "open" if args.rate else "closed",
+            "rate": args.rate,
+            "concurrency": args.concurrency,
+            **result,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
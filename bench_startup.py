@@ -0,0 +1,57 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Runs in a fresh interpreter so import cost is included in every sample.
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+from csao import CSAOConfig, CSAOEngine, RecommendationRequest
+from csao.data import RestaurantContext, sample_cooccurrence, sample_items, sample_users
+t_import = time.perf_counter()
+engine = CSAOEngine(
+    items=sample_items(),
+    users=sample_users(),
+    cooccurrence=sample_cooccurrence(),
+    cfg=CSAOConfig(startup_model=sys.argv[1]),
+    model_path=None,
+)
+engine.recommend(
+    RecommendationRequest("u_1", "r_10", "Hyderabad", "dinner", ["m_biryani"]),
+    RestaurantContext("r_10", "hyderabadi", "mid", "Hyderabad"),
+)
+t_ready = time.perf_counter()
+engine.wait_until_trained()
+t_trained = time.perf_counter()
+print(json.dumps({"import_s": t_import - t0, "ready_s": t_ready - t0, "trained_s": t_trained - t0}))
+"""
+
+
+def sample(mode: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", PROBE, mode], check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure CSAO import + readiness latency")
+    parser.add_argument("--modes", nargs="+", default=["default_artifact", "background", "inline"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--out", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes:
+        runs = [sample(mode) for _ in range(args.runs)]
+        results[mode] = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+        r = results[mode]
+        print(f"{mode:>16}: import={r['import_s']*1000:.1f}ms ready={r['ready_s']*1000:.1f}ms trained={r['trained_s']*1000:.1f}ms")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import json
+import time
+
+from csao.data import sample_cooccurrence, sample_items, sample_users
+from csao.eval import auc_score, log_loss
+from csao.ml_model import train_logistic_minibatch, train_logistic_newton, train_logistic_sgd
+from csao.ranker import build_synthetic_training_rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare logistic trainers on synthetic CSAO data")
+    parser.add_argument("--samples", type=int, default=900, help="Synthetic carts (rows = carts x candidates)")
+    parser.add_argument("--sgd-epochs", type=int, default=350)
+    parser.add_argument("--out", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    x_rows, y_rows = build_synthetic_training_rows(
+        items=sample_items(),
+        users=sample_users(),
+        cooccurrence_strength=sample_cooccurrence(),
+        n_samples=args.samples,
+        seed=42,
+    )
+    split = int(0.8 * len(x_rows))
+    x_train, x_test = x_rows[:split], x_rows[split:]
+    y_train, y_test = y_rows[:split], y_rows[split:]
+
+    trainers = {
+        "sgd": lambda: train_logistic_sgd(x_train, y_train, epochs=args.sgd_epochs, lr=0.06, l2=1e-4, seed=42),
+        "minibatch": lambda: train_logistic_minibatch(x_train, y_train, l2=1e-4, seed=42),
+        "newton": lambda: train_logistic_newton(x_train, y_train, l2=1e-4, seed=42),
+    }
+
+    results = {"train_rows": len(x_train), "test_rows": len(x_test), "trainers": {}}
+    for name, train in trainers.items():
+        t0 = time.perf_counter()
+        model = train()
+        elapsed = time.perf_counter() - t0
+        probs = [model.predict_proba(x) for x in x_test]
+        r = {"wall_s": elapsed, "log_loss": log_loss(y_test, probs), "auc": auc_score(y_test, probs)}
+        results["trainers"][name] = r
+        print(f"{name:>10}: wall={elapsed:.3f}s log_loss={r['log_loss']:.4f} auc={r['auc']:.4f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
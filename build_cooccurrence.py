@@ -0,0 +1,53 @@
+import argparse
+
+from csao.cooccurrence_builder import (
+    PairCounter,
+    directional_strengths,
+    iter_feedback_baskets,
+    iter_order_baskets,
+    write_cooccurrence,
+)
+from csao.storage import FeedbackStore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build directional co-occurrence strengths from logs")
+    parser.add_argument("--source", choices=["feedback", "orders"], default="feedback")
+    parser.add_argument("--db", default="artifacts/csao.db", help="Feedback database (--source feedback)")
+    parser.add_argument("--orders", help="Order log JSONL with an item_ids list per line (--source orders)")
+    parser.add_argument("--out", default="artifacts/csao_cooccurrence.csv", help=".csv or .jsonl")
+    parser.add_argument("--top-n", type=int, default=20, help="Targets kept per source item")
+    parser.add_argument("--min-support", type=int, default=5, help="Baskets a source item needs to be emitted")
+    parser.add_argument("--min-pair-count", type=int, default=2)
+    parser.add_argument("--max-pairs", type=int, default=2_000_000, help="Pair counts held in memory before spilling")
+    parser.add_argument("--spill-dir", default=None, help="Directory for spilled partial counts (default: system temp)")
+    args = parser.parse_args()
+
+    if args.source == "orders":
+        if not args.orders:
+            parser.error("--source orders needs --orders PATH")
+        baskets = iter_order_baskets(args.orders)
+        store = None
+    else:
+        store = FeedbackStore(args.db)
+        baskets = iter_feedback_baskets(store)
+
+    counter = PairCounter(max_pairs=args.max_pairs, spill_dir=args.spill_dir)
+    try:
+        for basket in baskets:
+            counter.add(basket)
+        rows = directional_strengths(
+            counter, top_n=args.top_n, min_support=args.min_support, min_pair_count=args.min_pair_count
+        )
+        n = write_cooccurrence(args.out, rows)
+    finally:
+        counter.close()
+        if store is not None:
+            store.close()
+
+    print(f"Counted {counter.baskets} baskets over {len(counter.ids)} items ({counter.spilled_runs} spilled runs)")
+    print(f"Wrote {n} pairs: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import argparse
+from dataclasses import asdict
+
+from csao.data import sample_cooccurrence, sample_items
+from csao.mmap_catalog import compile_catalog, read_records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compile a CSV/JSONL catalog into the mmap catalog format")
+    parser.add_argument("--items", help="Items .csv/.jsonl: item_id,name,category,cuisine,price,veg,popularity[,restaurant_id]")
+    parser.add_argument("--cooccurrence", help="Pairs .csv/.jsonl: source,target,strength")
+    parser.add_argument("--sample", action="store_true", help="Compile the built-in sample catalog instead")
+    parser.add_argument("--out", default="artifacts/catalog", help="Output directory")
+    args = parser.parse_args()
+
+    if args.sample:
+        items = (asdict(item) for item in sample_items().values())
+        cooc = ({"source": a, "target": b, "strength": s} for (a, b), s in sample_cooccurrence().items())
+    elif args.items:
+        items = read_records(args.items)
+        cooc = read_records(args.cooccurrence) if args.cooccurrence else iter(())
+    else:
+        parser.error("pass --items (and optionally --cooccurrence) or --sample")
+
+    stats = compile_catalog(items, cooc, args.out)
+    print(f"Compiled {stats['items']} items, {stats['restaurants']} restaurants, {stats['pairs']} pairs -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
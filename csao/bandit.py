@@ -1,6 +1,13 @@
 import math
+import threading
+import zlib
 from dataclasses import dataclass, field
-from typing import Dict
+from typing import Dict, Iterable, List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # score_boosts falls back to a plain list.
+    np = None
 
 
 @dataclass
@@ -9,25 +16,95 @@ class BanditState:
     accepts: Dict[str, int] = field(default_factory=dict)
 
 
+class _Stripe:
+    __slots__ = ("lock", "impressions", "accepts", "total")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.impressions: Dict[str, int] = {}
+        self.accepts: Dict[str, int] = {}
+        self.total = 0
+
+
 class UCBBandit:
-    def __init__(self, alpha: float = 0.25):
+    def __init__(self, alpha: float = 0.25, stripes: int = 16):
         self.alpha = alpha
-        self.state = BanditState()
+        # Counters are split across independently locked stripes so concurrent request
+        # threads rarely contend; each stripe keeps its own running impression total.
+        self._stripes = [_Stripe() for _ in range(max(1, stripes))]
 
-    def score_boost(self, item_id: str) -> float:
-        n = self.state.impressions.get(item_id, 0)
-        r = self.state.accepts.get(item_id, 0)
-        total = sum(self.state.impressions.values()) + 1
+    def _stripe(self, item_id: str) -> _Stripe:
+        return self._stripes[zlib.crc32(item_id.encode("utf-8")) % len(self._stripes)]
+
+    @property
+    def state(self) -> BanditState:
+        merged = BanditState()
+        for st in self._stripes:
+            with st.lock:
+                merged.impressions.update(st.impressions)
+                merged.accepts.update(st.accepts)
+        return merged
+
+    def restore(self, state: BanditState) -> None:
+        for st in self._stripes:
+            with st.lock:
+                st.impressions.clear()
+                st.accepts.clear()
+                st.total = 0
+        for item_id, n in state.impressions.items():
+            st = self._stripe(item_id)
+            with st.lock:
+                st.impressions[item_id] = n
+                st.total += n
+        for item_id, r in state.accepts.items():
+            st = self._stripe(item_id)
+            with st.lock:
+                st.accepts[item_id] = r
 
+    def total_impressions(self) -> int:
+        return sum(st.total for st in self._stripes)
+
+    def _boost(self, n: int, r: int, log_total: float) -> float:
         if n == 0:
             return self.alpha  # explore unseen items
 
         ctr = r / n
-        ucb = ctr + math.sqrt((2.0 * math.log(total)) / n)
+        ucb = ctr + math.sqrt((2.0 * log_total) / n)
         return self.alpha * min(ucb, 1.5)
 
+    def score_boost(self, item_id: str) -> float:
+        st = self._stripe(item_id)
+        n = st.impressions.get(item_id, 0)
+        r = st.accepts.get(item_id, 0)
+        return self._boost(n, r, math.log(self.total_impressions() + 1))
+
+    def score_boosts(self, item_ids: Sequence[str]) -> "np.ndarray | List[float]":
+        log_total = math.log(self.total_impressions() + 1)
+        counts = []
+        for iid in item_ids:
+            st = self._stripe(iid)
+            counts.append((st.impressions.get(iid, 0), st.accepts.get(iid, 0)))
+
+        if np is None:
+            return [self._boost(n, r, log_total) for n, r in counts]
+
+        nr = np.asarray(counts, dtype=np.float64).reshape(-1, 2)
+        n, r = nr[:, 0], nr[:, 1]
+        safe_n = np.maximum(n, 1.0)
+        ucb = r / safe_n + np.sqrt((2.0 * log_total) / safe_n)
+        return np.where(n == 0, self.alpha, self.alpha * np.minimum(ucb, 1.5))
+
     def log_impression(self, item_id: str) -> None:
-        self.state.impressions[item_id] = self.state.impressions.get(item_id, 0) + 1
+        st = self._stripe(item_id)
+        with st.lock:
+            st.impressions[item_id] = st.impressions.get(item_id, 0) + 1
+            st.total += 1
+
+    def log_impressions(self, item_ids: Iterable[str]) -> None:
+        for iid in item_ids:
+            self.log_impression(iid)
 
     def log_accept(self, item_id: str) -> None:
-        self.state.accepts[item_id] = self.state.accepts.get(item_id, 0) + 1
+        st = self._stripe(item_id)
+        with st.lock:
+            st.accepts[item_id] = st.accepts.get(item_id, 0) + 1
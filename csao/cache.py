@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Tuple
+
+from .ranker import RankedRecommendation
+
+# Rough per-entry footprint used for the memory cap; exact sizing is not worth the cost.
+_ENTRY_OVERHEAD = 256
+_REC_BYTES = 120
+
+
+class RecommendationCache:
+    # Bounded LRU with TTL in front of the pre-bandit ranking. Values are immutable tuples
+    # of RankedRecommendation, so hits can be shared between threads without copying.
+    def __init__(self, *, max_entries: int = 10000, max_bytes: int = 64 << 20, ttl_s: float = 30.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[Hashable, Tuple[float, int, Tuple[RankedRecommendation, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Tuple[RankedRecommendation, ...] | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at <= now:
+                del self._data[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Tuple[RankedRecommendation, ...]) -> None:
+        size = _ENTRY_OVERHEAD + _REC_BYTES * len(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._data[key] = (time.monotonic() + self.ttl_s, size, value)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -1,27 +1,50 @@
-from typing import Dict, List, Set, Tuple
+import heapq
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
 
-from .data import CAT_NEXT, Item
+from .data import CAT_NEXT
+from .features import CartContext
+from .index import CatalogIndex, CooccurrenceIndex
 
 
 def cooccurrence_candidates(
     cart_item_ids: List[str],
-    cooccurrence: Dict[Tuple[str, str], float],
+    cooccurrence: CooccurrenceIndex,
     limit: int,
 ) -> List[Tuple[str, str]]:
     # Returns (candidate_id, reason)
     scores: Dict[str, float] = {}
-    for source in cart_item_ids:
-        for (a, b), s in cooccurrence.items():
-            if a != source:
+    first_seen: Dict[str, Tuple[int, int]] = {}
+    for pos, source in enumerate(cart_item_ids):
+        for b, s, rank in cooccurrence.neighbors(source):
+            if b not in scores:
+                scores[b] = s
+                first_seen[b] = (pos, rank)
                 continue
-            scores[b] = max(scores.get(b, 0.0), s)
-
-    ordered = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-    return [(iid, "co_occurrence") for iid, _ in ordered[:limit]]
-
-
-def meal_graph_candidates(cart_item_ids: List[str], items: Dict[str, Item], limit: int) -> List[Tuple[str, str]]:
-    existing_categories = {items[i].category for i in cart_item_ids if i in items}
+            if s > scores[b]:
+                scores[b] = s
+            if (pos, rank) < first_seen[b]:
+                first_seen[b] = (pos, rank)
+
+    # Ties keep the order in which the full-table scan would have first met each candidate.
+    ordered = heapq.nsmallest(limit, scores, key=lambda iid: (-scores[iid], first_seen[iid]))
+    return [(iid, "co_occurrence") for iid in ordered]
+
+
+def _take(ranked: Iterable[Tuple[str, float, int]], skip: FrozenSet[str], limit: int) -> List[str]:
+    out: List[str] = []
+    if limit <= 0:
+        return out
+    for iid, _, _ in ranked:
+        if iid in skip:
+            continue
+        out.append(iid)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def meal_graph_candidates(cart: CartContext, catalog: CatalogIndex, limit: int) -> List[Tuple[str, str]]:
+    existing_categories = cart.categories
     targets: Set[str] = set()
 
     for c in existing_categories:
@@ -29,16 +52,10 @@ def meal_graph_candidates(cart_item_ids: List[str], items: Dict[str, Item], limi
             if nxt not in existing_categories:
                 targets.add(nxt)
 
-    candidates: List[Tuple[str, str, float]] = []
-    for iid, item in items.items():
-        if item.category in targets and iid not in cart_item_ids:
-            candidates.append((iid, "meal_completion", item.popularity))
-
-    candidates.sort(key=lambda x: x[2], reverse=True)
-    return [(iid, reason) for iid, reason, _ in candidates[:limit]]
+    ranked = catalog.merged_by_popularity(sorted(targets))
+    return [(iid, "meal_completion") for iid in _take(ranked, cart.item_set, limit)]
 
 
-def popularity_candidates(cart_item_ids: List[str], items: Dict[str, Item], limit: int) -> List[Tuple[str, str]]:
-    remaining = [(iid, item.popularity) for iid, item in items.items() if iid not in cart_item_ids]
-    remaining.sort(key=lambda x: x[1], reverse=True)
-    return [(iid, "popularity") for iid, _ in remaining[:limit]]
+def popularity_candidates(cart: CartContext, catalog: CatalogIndex, limit: int) -> List[Tuple[str, str]]:
+    ranked = catalog.by_popularity()
+    return [(iid, "popularity") for iid in _take(ranked, cart.item_set, limit)]
@@ -0,0 +1,162 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Mapping, Tuple
+
+from .data import Item
+from .index import CatalogIndex, CooccurrenceIndex
+from .item_features import ItemFeatureTable
+from .ml_model import np
+from .mmap_catalog import MappedCatalog, MappedCatalogIndex, MappedCooccurrenceIndex
+
+# Shard id used for every restaurant when no menus are configured.
+GLOBAL_SHARD = "*"
+
+
+@dataclass(frozen=True)
+class CatalogShard:
+    # One restaurant's menu with everything candidate generation and scoring read.
+    restaurant_id: str
+    items: Mapping[str, Item]
+    catalog: "CatalogIndex | MappedCatalogIndex"
+    cooccurrence_index: "CooccurrenceIndex | MappedCooccurrenceIndex"
+    item_features: ItemFeatureTable | None
+
+    @staticmethod
+    def build(
+        restaurant_id: str,
+        items: Mapping[str, Item],
+        cooccurrence: Dict[Tuple[str, str], float],
+        top_n: int | None = None,
+    ) -> "CatalogShard":
+        return CatalogShard(
+            restaurant_id=restaurant_id,
+            items=items,
+            catalog=CatalogIndex(items),
+            cooccurrence_index=CooccurrenceIndex(cooccurrence, top_n=top_n),
+            item_features=ItemFeatureTable(items) if np is not None else None,
+        )
+
+    @staticmethod
+    def from_mapped(restaurant_id: str, mapped: MappedCatalog, top_n: int | None = None) -> "CatalogShard":
+        # Whole-catalog shard read straight from the mmap columns: nothing is materialized
+        # per item at open time, neighbours and popularity lists are read as requests walk them.
+        return CatalogShard(
+            restaurant_id=restaurant_id,
+            items=mapped.items,
+            catalog=MappedCatalogIndex(mapped),
+            cooccurrence_index=MappedCooccurrenceIndex(mapped, top_n=top_n),
+            item_features=ItemFeatureTable.from_mapped(mapped),
+        )
+
+
+class ShardedCatalog:
+    # Catalog partitioned by restaurant. Shards are built on first use from the menu of
+    # that restaurant and kept in an LRU, so request cost depends on the menu size only
+    # and memory on the number of hot restaurants. Without menus there is a single
+    # global shard, which is the unpartitioned behavior.
+    #
+    # neighbors/position let a backing store that is not a dict (the mmap catalog) serve
+    # shards without materializing the whole table: neighbors(a) yields a's (b, strength)
+    # pairs in table order and position(a) is a's place in the catalog.
+    def __init__(
+        self,
+        items: Mapping[str, Item],
+        cooccurrence: Dict[Tuple[str, str], float] | None,
+        *,
+        menus: Mapping[str, List[str]] | None = None,
+        neighbors: Callable[[str], Iterable[Tuple[str, float]]] | None = None,
+        position: Callable[[str], int] | None = None,
+        max_shards: int = 1024,
+        top_n: int | None = None,
+        global_shard: CatalogShard | None = None,
+    ):
+        self.items = items
+        self.menus = menus
+        self.max_shards = max_shards
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        self._shards: "OrderedDict[str, CatalogShard]" = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+
+        if menus is None:
+            self._global: CatalogShard | None = global_shard or CatalogShard.build(
+                GLOBAL_SHARD, items, cooccurrence or {}, top_n
+            )
+            return
+        self._global = None
+
+        if neighbors is None:
+            # Pairs grouped by source keep their table order, which is all the index's
+            # tie-breaking depends on.
+            pairs: Dict[str, List[Tuple[str, float]]] = {}
+            for (a, b), s in (cooccurrence or {}).items():
+                pairs.setdefault(a, []).append((b, s))
+
+            def neighbors(a: str) -> Iterable[Tuple[str, float]]:
+                return pairs.get(a, ())
+
+        if position is None:
+            pos = {iid: i for i, iid in enumerate(items)}
+            position = pos.__getitem__
+        self._neighbors = neighbors
+        self._position = position
+
+    @classmethod
+    def from_mapped(cls, mapped: MappedCatalog, *, max_shards: int = 1024, top_n: int | None = None) -> "ShardedCatalog":
+        if not mapped.has_menus:
+            return cls(
+                mapped.items,
+                None,
+                max_shards=max_shards,
+                top_n=top_n,
+                global_shard=CatalogShard.from_mapped(GLOBAL_SHARD, mapped, top_n),
+            )
+        return cls(
+            mapped.items,
+            None,
+            menus=mapped.menus,
+            neighbors=mapped.neighbors,
+            position=mapped.row,
+            max_shards=max_shards,
+            top_n=top_n,
+        )
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def shard(self, restaurant_id: str) -> CatalogShard:
+        if self._global is not None:
+            return self._global
+
+        with self._lock:
+            shard = self._shards.get(restaurant_id)
+            if shard is not None:
+                self._shards.move_to_end(restaurant_id)
+                return shard
+
+        # Built outside the lock so a cold restaurant does not stall hot ones; a racing
+        # duplicate build is discarded.
+        shard = self._load(restaurant_id)
+        with self._lock:
+            existing = self._shards.get(restaurant_id)
+            if existing is not None:
+                return existing
+            self._shards[restaurant_id] = shard
+            self.loads += 1
+            while len(self._shards) > self.max_shards:
+                self._shards.popitem(last=False)
+                self.evictions += 1
+        return shard
+
+    def _load(self, restaurant_id: str) -> CatalogShard:
+        # Catalog order is kept so popularity ties break as in the global index.
+        menu = sorted({iid for iid in self.menus.get(restaurant_id, ()) if iid in self.items}, key=self._position)
+        items = {iid: self.items[iid] for iid in menu}
+        cooccurrence = {(a, b): s for a in items for b, s in self._neighbors(a) if b in items}
+        return CatalogShard.build(restaurant_id, items, cooccurrence, self.top_n)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"shards": len(self._shards), "loads": self.loads, "evictions": self.evictions}
@@ -6,6 +6,12 @@ class CSAOConfig:
     candidate_pool_size: int = 50
     top_k: int = 8
 
+    # Neighbors kept per source item in the co-occurrence index (None = keep all)
+    cooccurrence_top_n: int | None = None
+
+    # Restaurant menu shards kept in memory when the engine is given per-restaurant menus
+    catalog_max_shards: int = 1024
+
     # Ranking weights
     w_cooccurrence: float = 0.30
     w_meal_completion: float = 0.25
@@ -14,6 +20,23 @@ class CSAOConfig:
     w_popularity: float = 0.10
     w_context: float = 0.10
 
+    # Model used when no model_path artifact exists:
+    #   "default_artifact" - load the packaged csao/default_model.json (falls back to "background")
+    #   "background"       - serve a heuristic built from the weights above, train and swap in a thread
+    #   "inline"           - train synchronously in the constructor
+    startup_model: str = "default_artifact"
+
+    # Pre-bandit ranking cache
+    cache_enabled: bool = True
+    cache_ttl_s: float = 30.0
+    cache_max_entries: int = 10000
+    cache_max_bytes: int = 64 << 20
+
+    # Request tracing (off unless a sample rate or slow threshold is set)
+    trace_sample_rate: float = 0.0
+    trace_slow_ms: float | None = None
+    trace_path: str = "artifacts/traces/csao_traces.jsonl"
+
     # Bandit exploration
     bandit_enabled: bool = True
     ucb_alpha: float = 0.25
@@ -0,0 +1,202 @@
+import csv
+import heapq
+import json
+import os
+import tempfile
+from array import array
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .mmap_catalog import read_records
+from .storage import FeedbackStore
+
+# Pair keys pack (source_code, target_code) into one int so runs sort and merge as plain ints.
+_SHIFT = 32
+_MASK = (1 << _SHIFT) - 1
+_READ_BLOCK = 1 << 16
+# Runs open at once during a merge; more runs than this are first merged in passes.
+_MAX_FANIN = 64
+
+
+def iter_feedback_baskets(store: FeedbackStore, chunk_size: int = 5000) -> Iterator[List[str]]:
+    # Each accepted recommendation is one basket: the cart it was shown for plus the item.
+    for cart_csv, item_id in store.iter_accepted(chunk_size=chunk_size):
+        basket = [x for x in cart_csv.split(",") if x]
+        basket.append(item_id)
+        yield basket
+
+
+def iter_order_baskets(path: str) -> Iterator[List[str]]:
+    # Order log JSONL: one order per line with an "item_ids" (or "items") list.
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            order = json.loads(line)
+            items = order.get("item_ids", order.get("items", []))
+            yield [str(x["item_id"]) if isinstance(x, dict) else str(x) for x in items]
+
+
+def _sum_merged(runs: Iterable[Iterator[Tuple[int, int]]]) -> Iterator[Tuple[int, int]]:
+    # k-way merge of sorted (key, count) runs with the counts of equal keys summed.
+    key, count = None, 0
+    for k, c in heapq.merge(*runs):
+        if k == key:
+            count += c
+            continue
+        if key is not None:
+            yield key, count
+        key, count = k, c
+    if key is not None:
+        yield key, count
+
+
+def _read_run(path: str) -> Iterator[Tuple[int, int]]:
+    with open(path, "rb") as f:
+        while True:
+            block = array("q")
+            try:
+                block.fromfile(f, _READ_BLOCK * 2)
+            except EOFError:
+                pass
+            if not block:
+                return
+            for i in range(0, len(block), 2):
+                yield block[i], block[i + 1]
+
+
+class PairCounter:
+    # Sparse basket co-occurrence counts. Pair counts are held in a dict until it reaches
+    # max_pairs, then written to disk as a sorted run; iter_pairs() k-way merges the runs,
+    # so memory is bounded by max_pairs plus one read block per run. Item ids and their
+    # basket counts stay in memory: the vocabulary is far smaller than the pair space.
+    def __init__(self, *, max_pairs: int = 2_000_000, spill_dir: str | None = None):
+        self.max_pairs = max_pairs
+        self.spill_dir = spill_dir
+        self.ids: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self.item_counts: List[int] = []
+        self.baskets = 0
+        self._pairs: Dict[int, int] = {}
+        self._runs: List[str] = []
+        self.spilled_runs = 0
+
+    def _code(self, item_id: str) -> int:
+        code = self._codes.get(item_id)
+        if code is None:
+            code = len(self.ids)
+            self._codes[item_id] = code
+            self.ids.append(item_id)
+            self.item_counts.append(0)
+        return code
+
+    def add(self, basket: Iterable[str]) -> None:
+        codes = sorted({self._code(iid) for iid in basket})
+        if not codes:
+            return
+        self.baskets += 1
+        pairs = self._pairs
+        for a in codes:
+            self.item_counts[a] += 1
+            base = a << _SHIFT
+            for b in codes:
+                if a != b:
+                    key = base | b
+                    pairs[key] = pairs.get(key, 0) + 1
+        if len(pairs) >= self.max_pairs:
+            self._spill()
+
+    def _write_run(self, pairs: Iterable[Tuple[int, int]]) -> str:
+        fd, path = tempfile.mkstemp(prefix="csao-pairs-", suffix=".run", dir=self.spill_dir)
+        with os.fdopen(fd, "wb") as f:
+            run = array("q")
+            for key, count in pairs:
+                run.append(key)
+                run.append(count)
+                if len(run) >= _READ_BLOCK * 2:
+                    run.tofile(f)
+                    run = array("q")
+            run.tofile(f)
+        return path
+
+    def _spill(self) -> None:
+        pairs = self._pairs
+        self._runs.append(self._write_run((key, pairs[key]) for key in sorted(pairs)))
+        self.spilled_runs += 1
+        self._pairs = {}
+
+    def _compact(self) -> None:
+        # Merge the oldest runs into one until a final merge (plus the in-memory run) fits
+        # in _MAX_FANIN open files.
+        while len(self._runs) >= _MAX_FANIN:
+            batch, self._runs = self._runs[:_MAX_FANIN], self._runs[_MAX_FANIN:]
+            path = self._write_run(_sum_merged([_read_run(p) for p in batch]))
+            for p in batch:
+                os.remove(p)
+            self._runs.append(path)
+
+    def iter_pairs(self) -> Iterator[Tuple[int, int, int]]:
+        # (source_code, target_code, count) in key order with partial counts summed.
+        self._compact()
+        in_memory = sorted(self._pairs.items())
+        for key, count in _sum_merged([iter(in_memory)] + [_read_run(p) for p in self._runs]):
+            yield key >> _SHIFT, key & _MASK, count
+
+    def close(self) -> None:
+        for path in self._runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._runs = []
+        self._pairs = {}
+
+
+def directional_strengths(
+    counter: PairCounter,
+    *,
+    top_n: int | None = 20,
+    min_support: int = 1,
+    min_pair_count: int = 1,
+) -> Iterator[Tuple[str, str, float]]:
+    # P(b | a) = baskets with a and b / baskets with a, strongest top_n targets per source.
+    # Sources seen in fewer than min_support baskets are dropped as too noisy.
+    ids, item_counts = counter.ids, counter.item_counts
+    source, row = None, []
+
+    def emit(a: int, targets: List[Tuple[int, int]]) -> List[Tuple[str, str, float]]:
+        n = item_counts[a]
+        scored = sorted(((c / n, ids[b]) for b, c in targets), key=lambda x: (-x[0], x[1]))
+        return [(ids[a], b, s) for s, b in scored[:top_n]]
+
+    for a, b, c in counter.iter_pairs():
+        if a != source:
+            if source is not None and row:
+                yield from emit(source, row)
+            source, row = a, []
+        if item_counts[a] >= min_support and c >= min_pair_count:
+            row.append((b, c))
+    if source is not None and row:
+        yield from emit(source, row)
+
+
+def write_cooccurrence(path: str, rows: Iterable[Tuple[str, str, float]]) -> int:
+    # CSV or JSONL with source,target,strength; readable by load_cooccurrence and compile_catalog.py.
+    tmp = path + ".tmp"
+    n = 0
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            for a, b, s in rows:
+                f.write(json.dumps({"source": a, "target": b, "strength": s}) + "\n")
+                n += 1
+        else:
+            writer = csv.writer(f)
+            writer.writerow(["source", "target", "strength"])
+            for a, b, s in rows:
+                writer.writerow([a, b, repr(s)])
+                n += 1
+    os.replace(tmp, path)
+    return n
+
+
+def load_cooccurrence(path: str) -> Dict[Tuple[str, str], float]:
+    return {(str(r["source"]), str(r["target"])): float(r["strength"]) for r in read_records(path)}
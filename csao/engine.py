@@ -1,14 +1,38 @@
+import logging
+import threading
 import time
+from collections import deque
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Deque, Dict, List, Mapping, Tuple
 
 from .bandit import UCBBandit
+from .cache import RecommendationCache
+from .catalog import CatalogShard, ShardedCatalog
 from .candidate_generation import cooccurrence_candidates, meal_graph_candidates, popularity_candidates
 from .config import CSAOConfig
 from .data import Item, RestaurantContext, UserProfile
-from .ml_model import LogisticModel
-from .ranker import RankedRecommendation, rank_candidates, train_default_rank_model
+from .features import CartContext
+from .ml_model import LogisticModel, np
+from .metrics import EngineMetrics
+from .mmap_catalog import MappedCatalog
+from .tracing import NOOP_SPAN, Tracer
+from .ranker import (
+    FEATURE_DIM,
+    RankedRecommendation,
+    heuristic_rank_model,
+    candidate_rows,
+    order_scored,
+    score_rows,
+    train_default_rank_model,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# Prebuilt train_default_rank_model() output for the sample catalog; regenerate with
+# `python train_model.py --default-artifact`.
+DEFAULT_MODEL_PATH = Path(__file__).with_name("default_model.json")
 
 
 @dataclass
@@ -24,37 +48,252 @@ class RecommendationRequest:
 class CSAOEngine:
     def __init__(
         self,
-        items: Dict[str, Item],
+        items: Mapping[str, Item],
         users: Dict[str, UserProfile],
-        cooccurrence: Dict[Tuple[str, str], float],
+        cooccurrence: Dict[Tuple[str, str], float] | None,
         cfg: CSAOConfig | None = None,
         model_path: str | None = None,
+        menus: Dict[str, List[str]] | None = None,
+        catalog_file: MappedCatalog | None = None,
     ):
         self.items = items
         self.users = users
         self.cooccurrence = cooccurrence
         self.cfg = cfg or CSAOConfig()
+        self.catalog_file = catalog_file
+        if catalog_file is not None:
+            self.shards = ShardedCatalog.from_mapped(
+                catalog_file, max_shards=self.cfg.catalog_max_shards, top_n=self.cfg.cooccurrence_top_n
+            )
+        else:
+            # menus maps restaurant_id -> item ids; requests then only see their restaurant's shard.
+            self.shards = ShardedCatalog(
+                items,
+                cooccurrence,
+                menus=menus,
+                max_shards=self.cfg.catalog_max_shards,
+                top_n=self.cfg.cooccurrence_top_n,
+            )
         self.bandit = UCBBandit(alpha=self.cfg.ucb_alpha)
+        self.cache = RecommendationCache(
+            max_entries=self.cfg.cache_max_entries,
+            max_bytes=self.cfg.cache_max_bytes,
+            ttl_s=self.cfg.cache_ttl_s,
+        )
+        # (generation, model, version) swapped as one reference. A request reads it once, so
+        # it finishes on the model it started with; cache keys carry the generation so
+        # rankings from a replaced model are never served.
+        self._scorer: Tuple[int, LogisticModel | None, str] = (0, None, "")
+        self._swap_lock = threading.Lock()
+        self._history: Deque[LogisticModel] = deque(maxlen=5)
+        self._watch_stop = threading.Event()
+        self._watch_thread: threading.Thread | None = None
+        self.model_path = model_path
+
+        self._training_thread: threading.Thread | None = None
+
+        self.metrics = EngineMetrics()
+        self.tracer: Tracer | None = None
+        if self.cfg.trace_sample_rate > 0 or self.cfg.trace_slow_ms is not None:
+            self.enable_tracing(
+                Tracer(self.cfg.trace_path, sample_rate=self.cfg.trace_sample_rate, slow_ms=self.cfg.trace_slow_ms)
+            )
+        self.metrics.gauge("csao_cache_entries", "Entries in the pre-bandit ranking cache", lambda: len(self.cache))
+        self.metrics.gauge(
+            "csao_cache_lookups_total",
+            "Ranking cache lookups by result",
+            lambda: {"hit": self.cache.hits, "miss": self.cache.misses},
+            label="result",
+            kind="counter",
+        )
+        self.metrics.gauge("csao_catalog_shards", "Restaurant shards held in memory", lambda: len(self.shards))
 
         if model_path and Path(model_path).exists():
             self.model = LogisticModel.load(model_path)
+        elif self.cfg.startup_model == "inline":
+            self.model = self._train_default()
+        elif self.cfg.startup_model == "default_artifact" and DEFAULT_MODEL_PATH.exists():
+            self.model = LogisticModel.load(str(DEFAULT_MODEL_PATH))
         else:
-            self.model = train_default_rank_model(
-                items=self.items,
-                users=self.users,
-                cooccurrence_strength=self.cooccurrence,
-            )
+            self.model = heuristic_rank_model(self.cfg)
+            self._start_background_training()
 
-    def recommend(self, req: RecommendationRequest, context: RestaurantContext) -> Dict[str, object]:
-        t0 = time.perf_counter()
+    @classmethod
+    def from_catalog_file(
+        cls,
+        path: str,
+        users: Dict[str, UserProfile],
+        cfg: CSAOConfig | None = None,
+        model_path: str | None = None,
+    ) -> "CSAOEngine":
+        # Opens a compile_catalog.py output with mmap; shards are read from it on demand.
+        catalog_file = MappedCatalog(path)
+        return cls(catalog_file.items, users, None, cfg, model_path, catalog_file=catalog_file)
+
+    def _train_default(self) -> LogisticModel:
+        cooccurrence = self.cooccurrence
+        if cooccurrence is None:
+            cooccurrence = self.catalog_file.cooccurrence()
+        return train_default_rank_model(
+            items=self.items,
+            users=self.users,
+            cooccurrence_strength=cooccurrence,
+        )
+
+    def _start_background_training(self) -> None:
+        heuristic_version = self.model_version
+
+        def train() -> None:
+            # A model loaded meanwhile (hot reload) wins over the synthetic default.
+            self.swap_model(self._train_default(), expect_version=heuristic_version)
+
+        self._training_thread = threading.Thread(target=train, name="csao-default-training", daemon=True)
+        self._training_thread.start()
+
+    def wait_until_trained(self, timeout: float | None = None) -> bool:
+        if self._training_thread is not None:
+            self._training_thread.join(timeout)
+            return not self._training_thread.is_alive()
+        return True
+
+    @property
+    def model(self) -> LogisticModel:
+        return self._scorer[1]
+
+    @model.setter
+    def model(self, model: LogisticModel) -> None:
+        self.swap_model(model)
+
+    @property
+    def model_version(self) -> str:
+        return self._scorer[2]
+
+    def swap_model(self, model: LogisticModel, expect_version: str | None = None) -> str | None:
+        # With expect_version the swap only happens if that version is still being served
+        # (checked under the same lock), and None is returned when it was not. Swapping in the
+        # version already served is a no-op, so repeated reloads don't push rollback targets
+        # out of the history.
+        model.validate(FEATURE_DIM)
+        version = model.version()
+        with self._swap_lock:
+            gen, previous, current = self._scorer
+            if expect_version is not None and current != expect_version:
+                return None
+            if version == current:
+                return current
+            if previous is not None:
+                self._history.append(previous)
+            self._scorer = (gen + 1, model, version)
+            self.cache.clear()
+        return version
+
+    def reload_model(self, path: str | None = None) -> str:
+        # Load and validate on the caller's thread; only the final swap touches the engine.
+        path = path or self.model_path
+        if not path:
+            raise ValueError("No model path configured")
+        model = LogisticModel.load(path)
+        model.validate(FEATURE_DIM)
+        model.predict_proba([0.0] * FEATURE_DIM)
+        return self.swap_model(model)
+
+    def rollback_model(self) -> str:
+        with self._swap_lock:
+            if not self._history:
+                raise ValueError("No previous model to roll back to")
+            model = self._history.pop()
+            gen = self._scorer[0]
+            version = model.version()
+            self._scorer = (gen + 1, model, version)
+            self.cache.clear()
+        return version
+
+    def start_model_watch(self, interval_s: float = 5.0) -> None:
+        if self._watch_thread is not None or not self.model_path:
+            return
+        path = Path(self.model_path)
+
+        def stamp() -> Tuple[int, int] | None:
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                return None
+            return st.st_mtime_ns, st.st_size
+
+        def loop() -> None:
+            seen = stamp()
+            while not self._watch_stop.wait(interval_s):
+                current = stamp()
+                if current is None or current == seen:
+                    continue
+                seen = current
+                try:
+                    if LogisticModel.load(str(path)).version() != self.model_version:
+                        self.reload_model(str(path))
+                except (OSError, ValueError, KeyError, TypeError):
+                    # Half-written or invalid artifact: keep serving the current model.
+                    logger.exception("model reload from %s failed", path)
+
+        self._watch_thread = threading.Thread(target=loop, name="csao-model-watch", daemon=True)
+        self._watch_thread.start()
+
+    def stop_model_watch(self) -> None:
+        self._watch_stop.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join()
+            self._watch_thread = None
+
+    def enable_tracing(self, tracer: Tracer | None) -> None:
+        # None turns tracing off; spans then cost one attribute check.
+        previous, self.tracer = self.tracer, tracer
+        if previous is not None and previous is not tracer:
+            previous.close()
+
+    def span(self, name: str, **attrs: object):
+        tracer = self.tracer
+        return NOOP_SPAN if tracer is None else tracer.span(name, **attrs)
+
+    def stage(self, name: str):
+        # Times one stage into the latency histogram, and into the trace when tracing is on.
+        tracer = self.tracer
+        if tracer is None:
+            return self.metrics.stage_seconds.time(name)
+        return tracer.span(name, self.metrics.stage_seconds)
+
+    def _cache_key(self, gen: int, req: RecommendationRequest, context: RestaurantContext) -> Tuple:
+        return (
+            gen,
+            req.restaurant_id,
+            context.cuisine,
+            req.user_id,
+            req.time_of_day,
+            tuple(sorted(req.cart_item_ids)),
+            self._prerank_top_k(req),
+        )
+
+    def _user(self, req: RecommendationRequest, context: RestaurantContext) -> UserProfile:
         user = self.users.get(req.user_id)
         if user is None:
             user = UserProfile(user_id=req.user_id, veg_only=False, avg_cart_value=300, preferred_cuisines={context.cuisine})
+        return user
+
+    def _candidates(self, shard: CatalogShard, cart_item_ids: List[str]) -> Tuple[CartContext, List[Tuple[str, str]]]:
+        cart = CartContext.build(cart_item_ids, shard.items)
 
         pool_n = self.cfg.candidate_pool_size
-        c1 = cooccurrence_candidates(req.cart_item_ids, self.cooccurrence, limit=pool_n // 2)
-        c2 = meal_graph_candidates(req.cart_item_ids, self.items, limit=pool_n // 3)
-        c3 = popularity_candidates(req.cart_item_ids, self.items, limit=pool_n // 3)
+        with self.stage("cooccurrence") as sp:
+            c1 = cooccurrence_candidates(cart_item_ids, shard.cooccurrence_index, limit=pool_n // 2)
+            sp.set(candidates=len(c1))
+        with self.stage("meal_graph") as sp:
+            c2 = meal_graph_candidates(cart, shard.catalog, limit=pool_n // 3)
+            sp.set(candidates=len(c2))
+        with self.stage("popularity") as sp:
+            c3 = popularity_candidates(cart, shard.catalog, limit=pool_n // 3)
+            sp.set(candidates=len(c3))
+        counts = self.metrics.candidates
+        counts.inc("co_occurrence", len(c1))
+        counts.inc("meal_completion", len(c2))
+        counts.inc("popularity", len(c3))
 
         seen = set()
         merged: List[Tuple[str, str]] = []
@@ -64,27 +303,141 @@ class CSAOEngine:
                     continue
                 seen.add(iid)
                 merged.append((iid, reason))
+        self.metrics.pool_size.observe(len(merged))
+        return cart, merged
 
-        ranked = rank_candidates(
-            cart_item_ids=req.cart_item_ids,
-            candidate_with_reason=merged,
-            items=self.items,
-            user=user,
-            context=context,
-            time_of_day=req.time_of_day,
-            cooccurrence_strength=self.cooccurrence,
-            cfg=self.cfg,
-            model=self.model,
-        )
+    def _candidate_rows(
+        self,
+        shard: CatalogShard,
+        cart: CartContext,
+        merged: List[Tuple[str, str]],
+        user: UserProfile,
+        context: RestaurantContext,
+        time_of_day: str,
+    ) -> Tuple[List[Tuple[str, str]], "np.ndarray | List[List[float]]"]:
+        # Gather-based feature assembly; the per-item feature_vector path is the fallback.
+        with self.stage("features") as sp:
+            if shard.item_features is not None:
+                kept, rows = shard.item_features.candidate_rows(
+                    cart, merged, user, context.cuisine, time_of_day, shard.cooccurrence_index
+                )
+            else:
+                kept, rows = candidate_rows(cart, merged, shard.items, user, context, time_of_day, shard.cooccurrence_index)
+            sp.set(rows=len(kept))
+        return kept, rows
+
+    def _prerank_top_k(self, req: RecommendationRequest) -> int | None:
+        # The bandit reorders the whole pool, so only cut early when it is off.
+        return None if self.cfg.bandit_enabled else req.top_k
+
+    def recommend(self, req: RecommendationRequest, context: RestaurantContext) -> Dict[str, object]:
+        with self.span("engine.recommend", restaurant_id=req.restaurant_id, cart_size=len(req.cart_item_ids)) as span:
+            return self._recommend(req, context, span)
+
+    def _recommend(self, req: RecommendationRequest, context: RestaurantContext, span) -> Dict[str, object]:
+        t0 = time.perf_counter()
+        self.metrics.requests.inc("recommend")
+        gen, model, version = self._scorer
+        key = self._cache_key(gen, req, context) if self.cfg.cache_enabled else None
+        cached = self.cache.get(key) if key is not None else None
+        span.set(cache="hit" if cached is not None else "miss")
+        if cached is not None:
+            return self._respond(req, list(cached), t0, version)
+
+        user = self._user(req, context)
+        shard = self.shards.shard(req.restaurant_id)
+        cart, merged = self._candidates(shard, req.cart_item_ids)
+        span.set(pool=len(merged))
+
+        kept, rows = self._candidate_rows(shard, cart, merged, user, context, req.time_of_day)
+        with self.stage("scoring") as sp:
+            ranked = order_scored(kept, score_rows(model, rows), self._prerank_top_k(req))
+            sp.set(scored=len(kept))
+        if key is not None:
+            self.cache.put(key, tuple(ranked))
+        return self._respond(req, ranked, t0, version)
+
+    def recommend_batch(
+        self, requests: List[RecommendationRequest], contexts: List[RestaurantContext]
+    ) -> List[Dict[str, object]]:
+        if len(requests) != len(contexts):
+            raise ValueError("requests and contexts must have the same length")
+        with self.span("engine.recommend_batch", requests=len(requests)):
+            return self._recommend_batch(requests, contexts)
+
+    def _recommend_batch(
+        self, requests: List[RecommendationRequest], contexts: List[RestaurantContext]
+    ) -> List[Dict[str, object]]:
+        t0 = time.perf_counter()
+        self.metrics.requests.inc("recommend_batch", len(requests))
+        gen, model, version = self._scorer
+
+        keys: List[Tuple | None] = []
+        prerank: List[List[RankedRecommendation] | None] = []
+        for req, context in zip(requests, contexts):
+            key = self._cache_key(gen, req, context) if self.cfg.cache_enabled else None
+            cached = self.cache.get(key) if key is not None else None
+            keys.append(key)
+            prerank.append(list(cached) if cached is not None else None)
+
+        # Candidate generation depends only on the cart, so identical carts share it.
+        by_cart: Dict[Tuple, Tuple[CartContext, List[Tuple[str, str]]]] = {}
+        segments: Dict[int, Tuple[int, int, List[Tuple[str, str]]]] = {}
+        first_of: Dict[Tuple, int] = {}
+        duplicates: List[Tuple[int, int]] = []
+        blocks: List["np.ndarray | List[List[float]]"] = []
+        n_rows = 0
+        for i, (req, context) in enumerate(zip(requests, contexts)):
+            if prerank[i] is not None:
+                continue
+            if keys[i] is not None:
+                if keys[i] in first_of:
+                    duplicates.append((i, first_of[keys[i]]))
+                    continue
+                first_of[keys[i]] = i
+            shard = self.shards.shard(req.restaurant_id)
+            key = (shard.restaurant_id, tuple(req.cart_item_ids))
+            if key not in by_cart:
+                by_cart[key] = self._candidates(shard, req.cart_item_ids)
+            cart, merged = by_cart[key]
+            kept, rows = self._candidate_rows(shard, cart, merged, self._user(req, context), context, req.time_of_day)
+            segments[i] = (n_rows, n_rows + len(rows), kept)
+            blocks.append(rows)
+            n_rows += len(rows)
+
+        # One scoring pass over every uncached (cart, candidate) pair in the batch.
+        with self.stage("scoring") as sp:
+            sp.set(scored=n_rows)
+            if blocks and np is not None and isinstance(blocks[0], np.ndarray):
+                all_rows = np.vstack(blocks)
+            else:
+                all_rows = [x for rows in blocks for x in rows]
+            scores = score_rows(model, all_rows)
+            for i, (start, end, kept) in segments.items():
+                prerank[i] = order_scored(kept, scores[start:end], self._prerank_top_k(requests[i]))
+        for i in segments:
+            if keys[i] is not None:
+                self.cache.put(keys[i], tuple(prerank[i]))
+        for i, first in duplicates:
+            prerank[i] = list(prerank[first])
+
+        # The bandit step stays sequential so each result sees the impressions of the
+        # ones before it, exactly as N separate recommend() calls would.
+        return [self._respond(req, ranked, t0, version) for req, ranked in zip(requests, prerank)]
 
-        if self.cfg.bandit_enabled:
-            ranked = self._apply_bandit(ranked)
+    def _respond(
+        self, req: RecommendationRequest, ranked: List[RankedRecommendation], t0: float, model_version: str
+    ) -> Dict[str, object]:
+        with self.stage("bandit"):
+            if self.cfg.bandit_enabled:
+                ranked = self._apply_bandit(ranked)
 
-        top = ranked[: req.top_k]
-        for rec in top:
-            self.bandit.log_impression(rec.item_id)
+            top = ranked[: req.top_k]
+            self.bandit.log_impressions(rec.item_id for rec in top)
 
-        latency_ms = int((time.perf_counter() - t0) * 1000)
+        elapsed = time.perf_counter() - t0
+        self.metrics.stage_seconds.observe(elapsed, "total")
+        latency_ms = int(elapsed * 1000)
         return {
             "recommendations": [
                 {
@@ -96,13 +449,14 @@ class CSAOEngine:
                 for r in top
             ],
             "latency_ms": latency_ms,
+            "model_version": model_version,
         }
 
     def _apply_bandit(self, ranked: List[RankedRecommendation]) -> List[RankedRecommendation]:
+        boosts = self.bandit.score_boosts([rec.item_id for rec in ranked])
         reranked: List[RankedRecommendation] = []
-        for rec in ranked:
-            boost = self.bandit.score_boost(rec.item_id)
-            reranked.append(RankedRecommendation(item_id=rec.item_id, score=rec.score + boost, reason=rec.reason))
+        for rec, boost in zip(ranked, boosts):
+            reranked.append(RankedRecommendation(item_id=rec.item_id, score=rec.score + float(boost), reason=rec.reason))
         reranked.sort(key=lambda r: r.score, reverse=True)
         return reranked
 
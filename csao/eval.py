@@ -1,5 +1,7 @@
 import math
-from typing import Iterable, List, Sequence, Set
+from typing import Dict, Iterable, List, Sequence, Set
+
+from .ml_model import np
 
 
 def precision_at_k(pred: Sequence[str], truth: Set[str], k: int) -> float:
@@ -37,3 +39,183 @@ def batch_mean(values: Iterable[float]) -> float:
     if not vals:
         return 0.0
     return sum(vals) / len(vals)
+
+
+def _tie_ranks(scores: Sequence[float]) -> List[float]:
+    # 1-based ranks in ascending score order; tied scores share their average rank.
+    order = sorted(range(len(scores)), key=scores.__getitem__)
+    ranks = [0.0] * len(scores)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and scores[order[j + 1]] == scores[order[i]]:
+            j += 1
+        avg = (i + j) / 2.0 + 1.0
+        for t in range(i, j + 1):
+            ranks[order[t]] = avg
+        i = j + 1
+    return ranks
+
+
+def auc_score(y_true: Sequence[int], y_score: Sequence[float]) -> float:
+    # Mann-Whitney U: AUC = (rank sum of positives - P(P+1)/2) / (P * N), with ties at their
+    # average rank so a tied pair counts 1/2. O(n log n) instead of comparing every pair.
+    if np is not None:
+        y = np.asarray(y_true) == 1
+        s = np.asarray(y_score, dtype=np.float64)
+        n_pos = int(y.sum())
+        n_neg = len(y) - n_pos
+        if not n_pos or not n_neg:
+            return 0.5
+        uniq, inverse, counts = np.unique(s, return_inverse=True, return_counts=True)
+        # Average rank of each distinct score: (first + last) / 2 of its run, 1-based.
+        ends = np.cumsum(counts)
+        avg = ends - (counts - 1) / 2.0
+        rank_sum = float(avg[inverse.ravel()][y].sum())
+    else:
+        n_pos = sum(1 for v in y_true if v == 1)
+        n_neg = len(y_true) - n_pos
+        if not n_pos or not n_neg:
+            return 0.5
+        ranks = _tie_ranks(list(y_score))
+        rank_sum = sum(r for r, v in zip(ranks, y_true) if v == 1)
+    return (rank_sum - n_pos * (n_pos + 1) / 2.0) / (n_pos * n_neg)
+
+
+def log_loss(y_true: Sequence[int], y_prob: Sequence[float], eps: float = 1e-12) -> float:
+    if not len(y_true):
+        return 0.0
+    if np is not None:
+        y = np.asarray(y_true, dtype=np.float64)
+        p = np.clip(np.asarray(y_prob, dtype=np.float64), eps, 1.0 - eps)
+        return float(-(y * np.log(p) + (1.0 - y) * np.log(1.0 - p)).mean())
+    total = 0.0
+    for y, p in zip(y_true, y_prob):
+        p = min(max(p, eps), 1.0 - eps)
+        total -= y * math.log(p) + (1 - y) * math.log(1.0 - p)
+    return total / len(y_true)
+
+
+def calibration_buckets(y_true: Sequence[int], y_prob: Sequence[float], n_buckets: int = 10) -> List[Dict[str, float]]:
+    acc = EvalAccumulator(n_buckets=n_buckets, auc_bins=1)
+    acc.update(y_true, y_prob)
+    return acc.calibration()
+
+
+class EvalAccumulator:
+    # Streaming AUC / log-loss / calibration over probabilities in [0, 1]. Only fixed-size
+    # histograms are kept, so holdouts of any size can be scored chunk by chunk (or merged
+    # across processes). The AUC treats scores in the same 1 / auc_bins bin as tied, so it
+    # differs from auc_score by at most half the share of positive/negative pairs sharing a bin.
+    def __init__(self, n_buckets: int = 10, auc_bins: int = 1 << 16, eps: float = 1e-12):
+        self.n_buckets = n_buckets
+        self.auc_bins = auc_bins
+        self.eps = eps
+        self.count = 0
+        self.loss_sum = 0.0
+        self.pos_hist = [0] * auc_bins
+        self.neg_hist = [0] * auc_bins
+        # Per calibration bucket: [count, sum of predictions, positives]
+        self.buckets = [[0, 0.0, 0] for _ in range(n_buckets)]
+
+    @staticmethod
+    def _bin(p: float, n: int) -> int:
+        return min(max(int(p * n), 0), n - 1)
+
+    def update(self, y_true: Sequence[int], y_prob: Sequence[float]) -> None:
+        if np is not None:
+            y = np.asarray(y_true) == 1
+            p = np.asarray(y_prob, dtype=np.float64)
+            if not len(p):
+                return
+            self.count += len(p)
+            q = np.clip(p, self.eps, 1.0 - self.eps)
+            self.loss_sum -= float(np.where(y, np.log(q), np.log(1.0 - q)).sum())
+            bins = np.clip((p * self.auc_bins).astype(np.int64), 0, self.auc_bins - 1)
+            pos = np.bincount(bins[y], minlength=self.auc_bins)
+            neg = np.bincount(bins[~y], minlength=self.auc_bins)
+            for hist, part in ((self.pos_hist, pos), (self.neg_hist, neg)):
+                for i in np.flatnonzero(part).tolist():
+                    hist[i] += int(part[i])
+            b = np.clip((p * self.n_buckets).astype(np.int64), 0, self.n_buckets - 1)
+            counts = np.bincount(b, minlength=self.n_buckets)
+            sums = np.bincount(b, weights=p, minlength=self.n_buckets)
+            positives = np.bincount(b, weights=y, minlength=self.n_buckets)
+            for i in np.flatnonzero(counts).tolist():
+                bucket = self.buckets[i]
+                bucket[0] += int(counts[i])
+                bucket[1] += float(sums[i])
+                bucket[2] += int(positives[i])
+            return
+        for y, p in zip(y_true, y_prob):
+            self.count += 1
+            q = min(max(p, self.eps), 1.0 - self.eps)
+            self.loss_sum -= math.log(q) if y == 1 else math.log(1.0 - q)
+            hist = self.pos_hist if y == 1 else self.neg_hist
+            hist[self._bin(p, self.auc_bins)] += 1
+            bucket = self.buckets[self._bin(p, self.n_buckets)]
+            bucket[0] += 1
+            bucket[1] += p
+            bucket[2] += 1 if y == 1 else 0
+
+    def merge(self, other: "EvalAccumulator") -> None:
+        if other.auc_bins != self.auc_bins or other.n_buckets != self.n_buckets:
+            raise ValueError("accumulators use different bin counts")
+        self.count += other.count
+        self.loss_sum += other.loss_sum
+        for i, (a, b) in enumerate(zip(other.pos_hist, other.neg_hist)):
+            self.pos_hist[i] += a
+            self.neg_hist[i] += b
+        for mine, theirs in zip(self.buckets, other.buckets):
+            for i in range(3):
+                mine[i] += theirs[i]
+
+    def auc(self) -> float:
+        # Walk bins from low to high score: each positive beats every negative in lower
+        # bins and ties with the negatives in its own bin.
+        n_pos = sum(self.pos_hist)
+        n_neg = sum(self.neg_hist)
+        if not n_pos or not n_neg:
+            return 0.5
+        wins = 0.0
+        neg_below = 0
+        for pos, neg in zip(self.pos_hist, self.neg_hist):
+            if pos:
+                wins += pos * (neg_below + 0.5 * neg)
+            neg_below += neg
+        return wins / (n_pos * n_neg)
+
+    def log_loss(self) -> float:
+        return self.loss_sum / self.count if self.count else 0.0
+
+    def calibration(self) -> List[Dict[str, float]]:
+        # Reliability table: mean prediction vs observed positive rate per probability bucket.
+        out: List[Dict[str, float]] = []
+        width = 1.0 / self.n_buckets
+        for i, (count, pred_sum, positives) in enumerate(self.buckets):
+            if not count:
+                continue
+            out.append(
+                {
+                    "lower": i * width,
+                    "upper": (i + 1) * width,
+                    "count": count,
+                    "mean_pred": pred_sum / count,
+                    "positive_rate": positives / count,
+                }
+            )
+        return out
+
+    def expected_calibration_error(self) -> float:
+        if not self.count:
+            return 0.0
+        return sum(b["count"] * abs(b["mean_pred"] - b["positive_rate"]) for b in self.calibration()) / self.count
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "auc": self.auc(),
+            "log_loss": self.log_loss(),
+            "ece": self.expected_calibration_error(),
+            "calibration": self.calibration(),
+        }
@@ -0,0 +1,167 @@
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple
+
+from .data import Item, RestaurantContext, UserProfile
+from .features import CartContext
+from .index import CooccurrenceIndex
+from .ml_model import np
+from .parallel import chunked, run_chunks
+from .ranker import FEATURE_DIM, feature_vector
+from .storage import EventRow, FeedbackStore
+
+# Per-process catalog state, set once by _init_worker so chunks carry only log rows.
+_WORKER: Dict[str, object] = {}
+_MAX_CACHED_CARTS = 20000
+
+
+def _init_worker(
+    items: Dict[str, Item],
+    users: Dict[str, UserProfile],
+    cooccurrence: Dict[Tuple[str, str], float],
+) -> None:
+    _WORKER["items"] = items
+    _WORKER["users"] = users
+    _WORKER["cooccurrence"] = CooccurrenceIndex(cooccurrence)
+    _WORKER["carts"] = {}
+
+
+def featurize_rows(rows: List[Tuple[int, EventRow]]) -> Tuple[int, List[int], bytes, List[int]]:
+    # Returns (last event id read, event_ids, packed float32 features, labels) for the
+    # usable rows of a chunk.
+    items: Dict[str, Item] = _WORKER["items"]
+    users: Dict[str, UserProfile] = _WORKER["users"]
+    cooc: CooccurrenceIndex = _WORKER["cooccurrence"]
+    # Impressions from one request share a cart, so build each cart context once.
+    carts: Dict[str, CartContext] = _WORKER["carts"]
+    if len(carts) > _MAX_CACHED_CARTS:
+        carts.clear()
+
+    event_ids: List[int] = []
+    feats = array("f")
+    labels: List[int] = []
+    for event_id, (user_id, restaurant_id, city, time_of_day, cart_csv, item_id, reason, accepted) in rows:
+        if item_id not in items:
+            continue
+        user = users.get(user_id)
+        if user is None:
+            # skip unknown users for now; can be replaced with user feature store lookup
+            continue
+
+        cart = carts.get(cart_csv)
+        if cart is None:
+            cart = CartContext.build([x for x in cart_csv.split(",") if x in items], items)
+            carts[cart_csv] = cart
+        context = RestaurantContext(
+            restaurant_id=restaurant_id,
+            cuisine="indian",
+            price_level="mid",
+            city=city,
+        )
+
+        feats.extend(
+            feature_vector(
+                cart=cart,
+                candidate_id=item_id,
+                reason=reason,
+                items=items,
+                user=user,
+                context=context,
+                time_of_day=time_of_day,
+                cooccurrence=cooc,
+            )
+        )
+        event_ids.append(event_id)
+        labels.append(int(accepted))
+    return rows[-1][0], event_ids, feats.tobytes(), labels
+
+
+def iter_feature_chunks(
+    store: FeedbackStore,
+    after_id: int,
+    *,
+    upto_id: int | None = None,
+    items: Dict[str, Item],
+    users: Dict[str, UserProfile],
+    cooccurrence: Dict[Tuple[str, str], float],
+    workers: int = 1,
+    chunk_size: int = 5000,
+) -> Iterator[Tuple[int, List[int], bytes, List[int]]]:
+    # Yields (last_event_id_read, event_ids, features, labels) in log order. At most
+    # 2 * workers chunks are in flight, so memory does not grow with the log.
+    rows = store.iter_training_rows(after_id=after_id, upto_id=upto_id, chunk_size=chunk_size)
+    yield from run_chunks(
+        featurize_rows,
+        chunked(rows, chunk_size),
+        workers=workers,
+        initializer=_init_worker,
+        initargs=(items, users, cooccurrence),
+    )
+
+
+@dataclass
+class FeatureBatch:
+    event_ids: "np.ndarray | List[int]"
+    x: "np.ndarray | List[List[float]]"
+    y: "np.ndarray | List[int]"
+    last_event_id: int
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+
+def extract_features(
+    store: FeedbackStore,
+    after_id: int,
+    *,
+    items: Dict[str, Item],
+    users: Dict[str, UserProfile],
+    cooccurrence: Dict[Tuple[str, str], float],
+    workers: int = 1,
+    chunk_size: int = 5000,
+    out_path: str | None = None,
+) -> FeatureBatch:
+    # With NumPy the features land in one preallocated float32 matrix (optionally a
+    # memory-mapped .npy at out_path); without it they come back as plain lists.
+    # Fix the upper bound first so rows logged meanwhile cannot overflow the allocation.
+    upto_id = store.max_event_id()
+    chunks = iter_feature_chunks(
+        store,
+        after_id,
+        upto_id=upto_id,
+        items=items,
+        users=users,
+        cooccurrence=cooccurrence,
+        workers=workers,
+        chunk_size=chunk_size,
+    )
+
+    if np is None:
+        ids: List[int] = []
+        xs: List[List[float]] = []
+        ys: List[int] = []
+        for _, event_ids, packed, labels in chunks:
+            flat = array("f")
+            flat.frombytes(packed)
+            xs.extend(flat[i : i + FEATURE_DIM].tolist() for i in range(0, len(flat), FEATURE_DIM))
+            ids.extend(event_ids)
+            ys.extend(labels)
+        return FeatureBatch(event_ids=ids, x=xs, y=ys, last_event_id=max(upto_id, after_id))
+
+    capacity = store.count_events(after_id, upto_id)
+    if out_path:
+        x = np.lib.format.open_memmap(out_path, mode="w+", dtype=np.float32, shape=(capacity, FEATURE_DIM))
+    else:
+        x = np.empty((capacity, FEATURE_DIM), dtype=np.float32)
+    ids_arr = np.empty(capacity, dtype=np.int64)
+    y_arr = np.empty(capacity, dtype=np.int8)
+
+    n = 0
+    for _, event_ids, packed, labels in chunks:
+        k = len(labels)
+        x[n : n + k] = np.frombuffer(packed, dtype=np.float32).reshape(k, FEATURE_DIM)
+        ids_arr[n : n + k] = event_ids
+        y_arr[n : n + k] = labels
+        n += k
+
+    return FeatureBatch(event_ids=ids_arr[:n], x=x[:n], y=y_arr[:n], last_event_id=max(upto_id, after_id))
@@ -1,12 +1,35 @@
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Tuple
 
-from .data import Item, UserProfile, RestaurantContext
+from .data import CAT_NEXT, Item, UserProfile, RestaurantContext
 
 
 def cart_value(cart_item_ids: List[str], items: Dict[str, Item]) -> int:
     return sum(items[i].price for i in cart_item_ids if i in items)
 
 
+@dataclass(frozen=True)
+class CartContext:
+    # Everything about the cart that scoring needs, computed once per request.
+    item_ids: Tuple[str, ...]
+    item_set: FrozenSet[str]
+    total: int
+    categories: FrozenSet[str]
+    needed: FrozenSet[str]
+
+    @staticmethod
+    def build(cart_item_ids: List[str], items: Dict[str, Item]) -> "CartContext":
+        categories = frozenset(items[i].category for i in cart_item_ids if i in items)
+        needed = frozenset(nxt for c in categories for nxt in CAT_NEXT.get(c, []))
+        return CartContext(
+            item_ids=tuple(cart_item_ids),
+            item_set=frozenset(cart_item_ids),
+            total=cart_value(cart_item_ids, items),
+            categories=categories,
+            needed=needed,
+        )
+
+
 def category_distribution(cart_item_ids: List[str], items: Dict[str, Item]) -> Dict[str, int]:
     dist: Dict[str, int] = {}
     for iid in cart_item_ids:
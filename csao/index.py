@@ -0,0 +1,73 @@
+import heapq
+from typing import Dict, Iterator, List, Tuple
+
+from .data import Item
+
+# (target_id, strength, rank) where rank is the pair's position in the source table;
+# it keeps tie-breaking identical to a scan over the raw dict.
+Neighbor = Tuple[str, float, int]
+
+
+class CooccurrenceIndex:
+    def __init__(self, cooccurrence: Dict[Tuple[str, str], float], top_n: int | None = None):
+        neighbors: Dict[str, List[Neighbor]] = {}
+        for rank, ((a, b), s) in enumerate(cooccurrence.items()):
+            neighbors.setdefault(a, []).append((b, s, rank))
+
+        for lst in neighbors.values():
+            lst.sort(key=lambda x: x[1], reverse=True)
+            if top_n is not None:
+                del lst[top_n:]
+
+        self.top_n = top_n
+        self._neighbors = neighbors
+        self._strength: Dict[str, Dict[str, float]] = {
+            a: {b: s for b, s, _ in lst} for a, lst in neighbors.items()
+        }
+
+    def __len__(self) -> int:
+        return sum(len(lst) for lst in self._neighbors.values())
+
+    def neighbors(self, source: str) -> List[Neighbor]:
+        return self._neighbors.get(source, [])
+
+    def strength(self, source: str, target: str) -> float:
+        row = self._strength.get(source)
+        if row is None:
+            return 0.0
+        return row.get(target, 0.0)
+
+
+# (item_id, popularity, position) where position is the item's place in the catalog dict,
+# used to break popularity ties the same way a stable sort over the catalog would.
+Ranked = Tuple[str, float, int]
+
+
+def _by_popularity(entry: Ranked) -> Tuple[float, int]:
+    return -entry[1], entry[2]
+
+
+class CatalogIndex:
+    def __init__(self, items: Dict[str, Item]):
+        ranked = [(iid, item.popularity, pos) for pos, (iid, item) in enumerate(items.items())]
+        ranked.sort(key=_by_popularity)
+
+        by_category: Dict[str, List[Ranked]] = {}
+        for entry in ranked:
+            by_category.setdefault(items[entry[0]].category, []).append(entry)
+
+        self.items = items
+        self._global = ranked
+        self._by_category = by_category
+
+    def __len__(self) -> int:
+        return len(self._global)
+
+    def by_popularity(self) -> List[Ranked]:
+        return self._global
+
+    def merged_by_popularity(self, categories: List[str]) -> Iterator[Ranked]:
+        lists = [self._by_category[c] for c in categories if c in self._by_category]
+        if len(lists) == 1:
+            return iter(lists[0])
+        return heapq.merge(*lists, key=_by_popularity)
@@ -0,0 +1,175 @@
+from typing import Callable, Dict, List, Mapping, Tuple
+
+from .data import Item, RestaurantContext, UserProfile
+from .features import CartContext, context_score
+from .index import CooccurrenceIndex
+from .ml_model import np
+from .mmap_catalog import MappedCatalog
+from .ranker import FEATURE_DIM, FEATURE_NAMES, _max_cooccurrence
+
+_COL = {name: i for i, name in enumerate(FEATURE_NAMES)}
+_CATEGORY_COLUMNS = {"main": "is_main", "side": "is_side", "dessert": "is_dessert", "beverage": "is_beverage"}
+_REASONS = ("co_occurrence", "meal_completion", "popularity")
+_TIMES = ("breakfast", "lunch", "dinner")
+
+
+class ItemFeatureTable:
+    # Column-wise view of the catalog built once at load time: per-item arrays (popularity,
+    # price, veg, cuisine/category codes) plus small per-code lookup tables, so per-request
+    # columns are filled by gathers. context_score depends only on the item's cuisine and
+    # category, so it is tabulated per (cuisine, category) for each request bucket. Values
+    # match feature_vector() exactly. Requires numpy.
+    def __init__(self, items: Mapping[str, Item]):
+        ids = list(items)
+        pos = {iid: i for i, iid in enumerate(ids)}
+        cuisines = sorted({it.cuisine for it in items.values()})
+        categories = sorted({it.category for it in items.values()})
+        cuisine_code = {c: i for i, c in enumerate(cuisines)}
+        category_code = {c: i for i, c in enumerate(categories)}
+        n = len(ids)
+        popularity = np.empty(n, dtype=np.float64)
+        price = np.empty(n, dtype=np.float64)
+        veg = np.empty(n, dtype=bool)
+        cuisine = np.empty(n, dtype=np.intp)
+        category = np.empty(n, dtype=np.intp)
+        for i, iid in enumerate(ids):
+            it = items[iid]
+            popularity[i] = it.popularity
+            price[i] = it.price
+            veg[i] = it.veg
+            cuisine[i] = cuisine_code[it.cuisine]
+            category[i] = category_code[it.category]
+        self._setup(pos.get, n, cuisines, categories, cuisine, category, popularity, price, veg)
+
+    @classmethod
+    def from_mapped(cls, mapped: MappedCatalog) -> "ItemFeatureTable":
+        # Reads the mmap columns directly; no Item objects or id dict are built.
+        def row(item_id: str) -> int | None:
+            r = mapped.row(item_id)
+            return r if r >= 0 else None
+
+        table = cls.__new__(cls)
+        table._setup(
+            row,
+            len(mapped.item_ids),
+            mapped.cuisines,
+            mapped.categories,
+            mapped.cuisine,
+            mapped.category,
+            mapped.popularity,
+            mapped.price,
+            mapped.veg,
+        )
+        return table
+
+    def _setup(
+        self,
+        row: Callable[[str], int | None],
+        n: int,
+        cuisines: List[str],
+        categories: List[str],
+        cuisine: "np.ndarray",
+        category: "np.ndarray",
+        popularity: "np.ndarray",
+        price: "np.ndarray",
+        veg: "np.ndarray",
+    ) -> None:
+        self._row = row
+        self._n = n
+        self.cuisines = list(cuisines)
+        self.categories = list(categories)
+        self.cuisine = cuisine
+        self.category = category
+        self.popularity = popularity
+        self.price = price
+        self.veg = veg
+
+        # Item-only columns per category code: the category one-hot.
+        self._category_rows = np.zeros((len(self.categories), FEATURE_DIM), dtype=np.float64)
+        for code, c in enumerate(self.categories):
+            if c in _CATEGORY_COLUMNS:
+                self._category_rows[code, _COL[_CATEGORY_COLUMNS[c]]] = 1.0
+
+        # Reason one-hots; the extra last row is all zeros for reasons outside _REASONS.
+        self._reason_code = {r: i for i, r in enumerate(_REASONS)}
+        self._reason_rows = np.vstack([np.eye(len(_REASONS)), np.zeros(len(_REASONS))])
+
+        # context_score only compares the cuisine with item cuisines and only reacts to the
+        # known times, so every other (client-supplied) value shares the None bucket and the
+        # table set is fixed at load time.
+        self._known_cuisines = set(self.cuisines)
+        self._context: Dict[Tuple[str | None, str | None], "np.ndarray"] = {}
+        for ctx_cuisine in self.cuisines + [None]:
+            ctx = RestaurantContext(restaurant_id="", cuisine=ctx_cuisine, price_level="", city="")
+            for time_of_day in _TIMES + (None,):
+                self._context[(ctx_cuisine, time_of_day)] = np.array(
+                    [
+                        [
+                            context_score(ctx, Item("", "", cat, cui, 0, True, 0.0), time_of_day)
+                            for cat in self.categories
+                        ]
+                        for cui in self.cuisines
+                    ],
+                    dtype=np.float64,
+                ).reshape(len(self.cuisines), len(self.categories))
+
+    def __len__(self) -> int:
+        return self._n
+
+    def context_scores(self, cuisine: str, time_of_day: str) -> "np.ndarray":
+        # (item cuisine code, item category code) -> context_score for one request bucket.
+        return self._context[
+            (
+                cuisine if cuisine in self._known_cuisines else None,
+                time_of_day if time_of_day in _TIMES else None,
+            )
+        ]
+
+    def candidate_rows(
+        self,
+        cart: CartContext,
+        candidate_with_reason: List[Tuple[str, str]],
+        user: UserProfile,
+        cuisine: str,
+        time_of_day: str,
+        cooccurrence: CooccurrenceIndex,
+    ) -> Tuple[List[Tuple[str, str]], "np.ndarray"]:
+        # Same contract as ranker.candidate_rows, but returns one (k, FEATURE_DIM) matrix.
+        kept: List[Tuple[str, str]] = []
+        rows: List[int] = []
+        for iid, reason in candidate_with_reason:
+            if iid in cart.item_set:
+                continue
+            r = self._row(iid)
+            if r is not None:
+                kept.append((iid, reason))
+                rows.append(r)
+        idx = np.asarray(rows, dtype=np.intp)
+        cat = np.asarray(self.category[idx], dtype=np.intp)
+        cui = np.asarray(self.cuisine[idx], dtype=np.intp)
+        x = self._category_rows[cat]
+        if not kept:
+            return kept, x
+        x[:, _COL["popularity"]] = self.popularity[idx]
+
+        x[:, _COL["max_cooccurrence"]] = [_max_cooccurrence(cart, iid, cooccurrence) for iid, _ in kept]
+
+        needed = np.array([c in cart.needed for c in self.categories])
+        x[:, _COL["meal_completion"]] = needed[cat]
+
+        preferred = np.array([c in user.preferred_cuisines for c in self.cuisines])
+        pref = np.where(preferred[cui], 1.0, 0.6)
+        if user.veg_only:
+            pref = np.where(self.veg[idx], pref, 0.0)
+        x[:, _COL["user_preference"]] = pref
+
+        target = user.avg_cart_value
+        gap = np.abs(target - (cart.total + self.price[idx]))
+        x[:, _COL["budget_fit"]] = np.maximum(0.0, 1.0 - gap / (max(target, 1) * 1.25))
+
+        x[:, _COL["context"]] = self.context_scores(cuisine, time_of_day)[cui, cat]
+
+        other = len(_REASONS)
+        codes = np.fromiter((self._reason_code.get(r, other) for _, r in kept), dtype=np.intp, count=len(kept))
+        x[:, _COL["reason_co_occurrence"] : _COL["reason_popularity"] + 1] = self._reason_rows[codes]
+        return kept, x
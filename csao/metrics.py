@@ -0,0 +1,205 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+# Metrics meant to stay on in production: the hot path only touches a per-thread shard
+# (no lock, no contention), and shards are summed when /metrics is scraped.
+
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(label: str | None, value: str, extra: str = "") -> str:
+    parts = []
+    if label:
+        parts.append(f'{label}="{value}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _accumulate(out: Dict[str, List[float]], shard: Dict[str, List[float]]) -> None:
+    for key, row in list(shard.items()):
+        acc = out.get(key)
+        if acc is None:
+            acc = out[key] = [0] * len(row)
+        for i, v in enumerate(row):
+            acc[i] += v
+
+
+class _Sharded:
+    def __init__(self, name: str, help: str, label: str | None = None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, Dict[str, List[float]]]] = []
+        # Totals of threads that have exited, so thread-per-request servers don't grow
+        # one shard per request.
+        self._base: Dict[str, List[float]] = {}
+
+    def _shard(self) -> Dict[str, List[float]]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._fold_dead()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold_dead(self) -> None:
+        # Caller holds _lock. A thread that is no longer alive can't write its shard again.
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _accumulate(self._base, shard)
+        self._shards = live
+
+    def _merged(self) -> Dict[str, List[float]]:
+        with self._lock:
+            self._fold_dead()
+            out = {key: list(row) for key, row in self._base.items()}
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            _accumulate(out, shard)
+        return out
+
+
+class Counter(_Sharded):
+    def inc(self, label_value: str = "", n: float = 1) -> None:
+        shard = self._shard()
+        row = shard.get(label_value)
+        if row is None:
+            row = shard[label_value] = [0]
+        row[0] += n
+
+    def value(self, label_value: str = "") -> float:
+        return self._merged().get(label_value, [0])[0]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, (v,) in sorted(self._merged().items()):
+            lines.append(f"{self.name}{_labels(self.label, key)} {_fmt(v)}")
+        return lines
+
+
+class Histogram(_Sharded):
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS, label: str | None = None):
+        super().__init__(name, help, label)
+        self.buckets = tuple(buckets)
+        # Row layout: one count per bucket, one for +Inf, then the sum.
+        self._width = len(self.buckets) + 2
+
+    def observe(self, value: float, label_value: str = "") -> None:
+        shard = self._shard()
+        row = shard.get(label_value)
+        if row is None:
+            row = shard[label_value] = [0] * (self._width - 1) + [0.0]
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def time(self, label_value: str = "") -> "_Timer":
+        return _Timer(self, label_value)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, row in sorted(self._merged().items()):
+            cumulative = 0
+            for le, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le_label = 'le="%s"' % _fmt(le)
+                lines.append(f"{self.name}_bucket{_labels(self.label, key, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label, key)} {_fmt(row[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.label, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("hist", "label_value", "t0")
+
+    def __init__(self, hist: Histogram, label_value: str):
+        self.hist = hist
+        self.label_value = label_value
+
+    def __enter__(self) -> "_Timer":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.hist.observe(time.perf_counter() - self.t0, self.label_value)
+
+    def set(self, **attrs: object) -> None:
+        # Same interface as a trace span, so stages are timed the same way with tracing off.
+        pass
+
+
+class Gauge:
+    # Read at scrape time from a callback returning a number or {label_value: number}.
+    def __init__(self, name: str, help: str, fn: Callable[[], "float | Dict[str, float]"], label: str | None = None, kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.label = label
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        value = self.fn()
+        if isinstance(value, dict):
+            for key, v in sorted(value.items()):
+                lines.append(f"{self.name}{_labels(self.label, key)} {_fmt(v)}")
+        else:
+            lines.append(f"{self.name} {_fmt(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, "Counter | Histogram | Gauge"] = {}
+
+    def register(self, metric: "Counter | Histogram | Gauge") -> "Counter | Histogram | Gauge":
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4.
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class EngineMetrics:
+    # The metrics CSAOEngine and CSAOService record; gauges are attached by their owners.
+    def __init__(self) -> None:
+        self.registry = MetricsRegistry()
+        self.stage_seconds: Histogram = self.registry.register(
+            Histogram("csao_stage_seconds", "Latency of each recommendation stage", label="stage")
+        )
+        self.requests: Counter = self.registry.register(
+            Counter("csao_requests_total", "Recommendations served", label="path")
+        )
+        self.candidates: Counter = self.registry.register(
+            Counter("csao_candidates_total", "Candidates produced per source before merging", label="source")
+        )
+        self.pool_size: Histogram = self.registry.register(
+            Histogram("csao_candidate_pool_size", "Merged candidate pool size per request", buckets=SIZE_BUCKETS)
+        )
+
+    def gauge(self, name: str, help: str, fn: Callable[[], "float | Dict[str, float]"], **kw: str) -> None:
+        self.registry.register(Gauge(name, help, fn, **kw))
+
+    def render(self) -> str:
+        return self.registry.render()
@@ -1,9 +1,16 @@
+import hashlib
 import json
 import math
+import os
 import random
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Sequence
+from typing import List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; callers fall back to the per-row path.
+    np = None
 
 
 @dataclass(frozen=True)
@@ -22,6 +29,22 @@ class LogisticModel:
         ez = math.exp(z)
         return ez / (1.0 + ez)
 
+    def predict_proba_batch(self, x: "np.ndarray") -> "np.ndarray":
+        if np is None:
+            raise RuntimeError("predict_proba_batch requires numpy")
+        z = x @ np.asarray(self.weights, dtype=np.float64) + self.bias
+        return sigmoid(z)
+
+    def version(self) -> str:
+        payload = json.dumps(self.to_dict(), sort_keys=True).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()[:12]
+
+    def validate(self, dim: int) -> None:
+        if len(self.weights) != dim:
+            raise ValueError(f"Model has {len(self.weights)} weights, expected {dim}")
+        if not all(math.isfinite(w) for w in self.weights) or not math.isfinite(self.bias):
+            raise ValueError("Model has non-finite parameters")
+
     def to_dict(self) -> dict:
         return {"weights": self.weights, "bias": self.bias}
 
@@ -32,7 +55,10 @@ class LogisticModel:
     def save(self, path: str) -> None:
         p = Path(path)
         p.parent.mkdir(parents=True, exist_ok=True)
-        p.write_text(json.dumps(self.to_dict()), encoding="utf-8")
+        # Write then rename so a watching server never reads a half-written artifact.
+        tmp = p.with_name(p.name + ".tmp")
+        tmp.write_text(json.dumps(self.to_dict()), encoding="utf-8")
+        os.replace(tmp, p)
 
     @staticmethod
     def load(path: str) -> "LogisticModel":
@@ -40,6 +66,16 @@ class LogisticModel:
         return LogisticModel.from_dict(payload)
 
 
+def sigmoid(z: "np.ndarray") -> "np.ndarray":
+    # Same split as predict_proba so large |z| never overflows exp.
+    out = np.empty_like(z, dtype=np.float64)
+    pos = z >= 0
+    out[pos] = 1.0 / (1.0 + np.exp(-z[pos]))
+    ez = np.exp(z[~pos])
+    out[~pos] = ez / (1.0 + ez)
+    return out
+
+
 def train_logistic_sgd(
     x_rows: List[List[float]],
     y_rows: List[int],
@@ -48,13 +84,20 @@ def train_logistic_sgd(
     lr: float = 0.08,
     l2: float = 1e-4,
     seed: int = 42,
+    init: LogisticModel | None = None,
 ) -> LogisticModel:
     if not x_rows or not y_rows or len(x_rows) != len(y_rows):
         raise ValueError("Invalid training data for logistic model")
 
     dim = len(x_rows[0])
-    w = [0.0] * dim
-    b = 0.0
+    if init is not None:
+        if len(init.weights) != dim:
+            raise ValueError("Warm-start model does not match feature dimension")
+        w = list(init.weights)
+        b = init.bias
+    else:
+        w = [0.0] * dim
+        b = 0.0
 
     idx = list(range(len(x_rows)))
     rnd = random.Random(seed)
@@ -82,3 +125,141 @@ def train_logistic_sgd(
             b -= lr * err
 
     return LogisticModel(weights=w, bias=b)
+
+
+def _design(x_rows: "List[List[float]] | np.ndarray", y_rows: "List[int] | np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    if np is None:
+        raise RuntimeError("Vectorized training requires numpy")
+    x = np.asarray(x_rows, dtype=np.float64)
+    y = np.asarray(y_rows, dtype=np.float64)
+    if x.ndim != 2 or x.shape[0] == 0 or x.shape[0] != y.shape[0]:
+        raise ValueError("Invalid training data for logistic model")
+    # Bias is carried as a trailing constant column.
+    return np.hstack([x, np.ones((x.shape[0], 1))]), y
+
+
+def _initial_theta(dim: int, init: LogisticModel | None) -> "np.ndarray":
+    if init is None:
+        return np.zeros(dim + 1)
+    if len(init.weights) != dim:
+        raise ValueError("Warm-start model does not match feature dimension")
+    return np.asarray(list(init.weights) + [init.bias], dtype=np.float64)
+
+
+def _holdout(n: int, val_fraction: float, seed: int) -> Tuple["np.ndarray", "np.ndarray"]:
+    idx = np.random.default_rng(seed).permutation(n)
+    n_val = int(n * val_fraction) if n >= 20 else 0
+    return idx[n_val:], idx[:n_val]
+
+
+def _mean_log_loss(xb: "np.ndarray", y: "np.ndarray", theta: "np.ndarray") -> float:
+    z = xb @ theta
+    return float(np.mean(np.logaddexp(0.0, z) - y * z))
+
+
+def _objective(xb: "np.ndarray", y: "np.ndarray", theta: "np.ndarray", reg: "np.ndarray") -> float:
+    return _mean_log_loss(xb, y, theta) + 0.5 * float(np.sum(reg * theta * theta))
+
+
+def _to_model(theta: "np.ndarray") -> LogisticModel:
+    return LogisticModel(weights=[float(v) for v in theta[:-1]], bias=float(theta[-1]))
+
+
+def train_logistic_minibatch(
+    x_rows: "List[List[float]] | np.ndarray",
+    y_rows: "List[int] | np.ndarray",
+    *,
+    epochs: int = 200,
+    batch_size: int = 256,
+    lr: float = 0.5,
+    l2: float = 1e-4,
+    seed: int = 42,
+    init: LogisticModel | None = None,
+    val_fraction: float = 0.1,
+    patience: int = 10,
+) -> LogisticModel:
+    xb, y = _design(x_rows, y_rows)
+    theta = _initial_theta(xb.shape[1] - 1, init)
+    reg = np.full(xb.shape[1], l2)
+    reg[-1] = 0.0
+
+    train_idx, val_idx = _holdout(xb.shape[0], val_fraction, seed)
+    rng = np.random.default_rng(seed)
+    best_loss, best_theta, bad = math.inf, theta.copy(), 0
+
+    for _ in range(epochs):
+        order = train_idx[rng.permutation(train_idx.shape[0])]
+        for start in range(0, order.shape[0], batch_size):
+            batch = order[start : start + batch_size]
+            xs = xb[batch]
+            err = sigmoid(xs @ theta) - y[batch]
+            theta -= lr * (xs.T @ err / batch.shape[0] + reg * theta)
+
+        if val_idx.shape[0] == 0:
+            best_theta = theta.copy()
+            continue
+        # Early stopping on held-out log-loss.
+        loss = _mean_log_loss(xb[val_idx], y[val_idx], theta)
+        if loss < best_loss - 1e-7:
+            best_loss, best_theta, bad = loss, theta.copy(), 0
+        else:
+            bad += 1
+            if bad >= patience:
+                break
+
+    return _to_model(best_theta)
+
+
+def train_logistic_newton(
+    x_rows: "List[List[float]] | np.ndarray",
+    y_rows: "List[int] | np.ndarray",
+    *,
+    max_iter: int = 50,
+    l2: float = 1e-4,
+    tol: float = 1e-8,
+    seed: int = 42,
+    init: LogisticModel | None = None,
+    val_fraction: float = 0.1,
+    patience: int = 3,
+) -> LogisticModel:
+    # Damped Newton (IRLS) on the L2-regularized mean log-loss. With ~a dozen features the
+    # Hessian is tiny, so each iteration costs two passes over the data.
+    xb, y = _design(x_rows, y_rows)
+    theta = _initial_theta(xb.shape[1] - 1, init)
+    reg = np.full(xb.shape[1], l2)
+    reg[-1] = 0.0
+
+    train_idx, val_idx = _holdout(xb.shape[0], val_fraction, seed)
+    xt, yt = xb[train_idx], y[train_idx]
+    xv, yv = xb[val_idx], y[val_idx]
+    n = xt.shape[0]
+    ridge = np.diag(reg + 1e-9)
+    best_loss, best_theta, bad = math.inf, theta.copy(), 0
+
+    for _ in range(max_iter):
+        p = sigmoid(xt @ theta)
+        grad = xt.T @ (p - yt) / n + reg * theta
+        hess = (xt.T * (p * (1.0 - p))) @ xt / n + ridge
+        step = np.linalg.solve(hess, grad)
+
+        # Backtracking keeps the step from overshooting on nearly separable data.
+        f0 = _objective(xt, yt, theta, reg)
+        t = 1.0
+        while t > 1e-4 and _objective(xt, yt, theta - t * step, reg) > f0 - 1e-4 * t * float(grad @ step):
+            t *= 0.5
+        theta = theta - t * step
+
+        if val_idx.shape[0] == 0:
+            best_theta = theta.copy()
+        else:
+            loss = _mean_log_loss(xv, yv, theta)
+            if loss < best_loss - 1e-9:
+                best_loss, best_theta, bad = loss, theta.copy(), 0
+            else:
+                bad += 1
+                if bad >= patience:
+                    break
+        if float(np.max(np.abs(t * step))) < tol:
+            break
+
+    return _to_model(best_theta)
@@ -0,0 +1,373 @@
+import csv
+import heapq
+import json
+import shutil
+from collections.abc import Mapping
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from .data import Item
+from .index import Neighbor, Ranked, _by_popularity
+from .ml_model import np
+
+# On-disk catalog: one directory of .npy columns opened with mmap, so start-up does not
+# parse the catalog and worker processes share the page cache. Strings are interned
+# into utf-8 blobs with offsets; co-occurrence is a CSR matrix over item rows.
+FORMAT_VERSION = 1
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("the mmap catalog needs numpy")
+
+
+def _load(path: Path) -> "np.ndarray":
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        # Zero-length arrays cannot be mapped.
+        return np.load(path)
+
+
+class _StringTable:
+    def __init__(self, root: Path, name: str, lookup: bool = True):
+        # Plain views over the mapping: memmap's per-slice subclass overhead dominates lookups.
+        self._blob = memoryview(np.asarray(_load(root / f"{name}.bytes.npy")))
+        self._offsets = np.asarray(_load(root / f"{name}.offsets.npy"))
+        # Row numbers in byte order of the strings, for binary search without a dict.
+        self._sorted = np.asarray(_load(root / f"{name}.sorted.npy")) if lookup else None
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def _raw(self, row: int) -> bytes:
+        return bytes(self._blob[self._offsets[row] : self._offsets[row + 1]])
+
+    def __getitem__(self, row: int) -> str:
+        return self._raw(row).decode("utf-8")
+
+    def find(self, value: str) -> int:
+        # Row of value, or -1.
+        key = value.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._raw(int(self._sorted[mid])) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self):
+            row = int(self._sorted[lo])
+            if self._raw(row) == key:
+                return row
+        return -1
+
+
+class MappedItems(Mapping):
+    # Dict-like view that builds Item objects on access instead of holding one per row.
+    def __init__(self, catalog: "MappedCatalog"):
+        self._catalog = catalog
+
+    def __getitem__(self, item_id: str) -> Item:
+        row = self._catalog.row(item_id) if isinstance(item_id, str) else -1
+        if row < 0:
+            raise KeyError(item_id)
+        return self._catalog.item(row)
+
+    def __contains__(self, item_id: object) -> bool:
+        return isinstance(item_id, str) and self._catalog.row(item_id) >= 0
+
+    def __len__(self) -> int:
+        return len(self._catalog.item_ids)
+
+    def __iter__(self) -> Iterator[str]:
+        ids = self._catalog.item_ids
+        return (ids[i] for i in range(len(ids)))
+
+
+class MappedMenus(Mapping):
+    # restaurant_id -> item ids in catalog order.
+    def __init__(self, catalog: "MappedCatalog"):
+        self._catalog = catalog
+
+    def __getitem__(self, restaurant_id: str) -> List[str]:
+        c = self._catalog
+        r = c.restaurant_ids.find(restaurant_id) if isinstance(restaurant_id, str) else -1
+        if r < 0:
+            raise KeyError(restaurant_id)
+        rows = c.menu_items[c.menu_indptr[r] : c.menu_indptr[r + 1]]
+        return [c.item_ids[int(i)] for i in rows]
+
+    def __len__(self) -> int:
+        return len(self._catalog.restaurant_ids)
+
+    def __iter__(self) -> Iterator[str]:
+        ids = self._catalog.restaurant_ids
+        return (ids[i] for i in range(len(ids)))
+
+
+class MappedCatalog:
+    def __init__(self, path: str):
+        _require_numpy()
+        root = Path(path)
+        meta = json.loads((root / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported catalog format {meta.get('format_version')!r} in {path}")
+        self.path = path
+        self.categories: List[str] = meta["categories"]
+        self.cuisines: List[str] = meta["cuisines"]
+
+        def col(name: str) -> "np.ndarray":
+            return _load(root / f"{name}.npy")
+
+        self.item_ids = _StringTable(root, "item_ids")
+        self.names = _StringTable(root, "names", lookup=False)
+        self.category = col("category")
+        self.cuisine = col("cuisine")
+        self.price = col("price")
+        self.veg = col("veg")
+        self.popularity = col("popularity")
+        self.restaurant_ids = _StringTable(root, "restaurant_ids")
+        self.menu_indptr = col("menu_indptr")
+        self.menu_items = col("menu_items")
+        self.cooc_indptr = col("cooc_indptr")
+        self.cooc_indices = col("cooc_indices")
+        self.cooc_data = col("cooc_data")
+        # Rows by (-popularity, row), written by compile_catalog; derived on open for
+        # catalogs compiled before the column existed.
+        order_path = root / "popularity_order.npy"
+        self.popularity_order = (
+            _load(order_path) if order_path.exists() else _popularity_order(np.asarray(self.popularity))
+        )
+
+        self.items = MappedItems(self)
+        self.menus = MappedMenus(self)
+        # Hot ids (carts, candidates) repeat across requests; skip their binary search.
+        self.row = lru_cache(maxsize=65536)(self.item_ids.find)
+
+    @property
+    def has_menus(self) -> bool:
+        return len(self.restaurant_ids) > 0
+
+    def item(self, row: int) -> Item:
+        return Item(
+            item_id=self.item_ids[row],
+            name=self.names[row],
+            category=self.categories[int(self.category[row])],
+            cuisine=self.cuisines[int(self.cuisine[row])],
+            price=int(self.price[row]),
+            veg=bool(self.veg[row]),
+            popularity=float(self.popularity[row]),
+        )
+
+    def neighbors(self, item_id: str) -> List[Tuple[str, float]]:
+        # Outgoing pairs of one item, in the order they appeared in the source table.
+        row = self.row(item_id)
+        if row < 0:
+            return []
+        lo, hi = int(self.cooc_indptr[row]), int(self.cooc_indptr[row + 1])
+        return [(self.item_ids[int(j)], float(s)) for j, s in zip(self.cooc_indices[lo:hi], self.cooc_data[lo:hi])]
+
+    def cooccurrence(self) -> Dict[Tuple[str, str], float]:
+        # Full table as a dict; only for offline use such as synthetic training.
+        out: Dict[Tuple[str, str], float] = {}
+        for a in self.items:
+            for b, s in self.neighbors(a):
+                out[(a, b)] = s
+        return out
+
+
+def _popularity_order(popularity: "np.ndarray") -> "np.ndarray":
+    return np.lexsort((np.arange(len(popularity)), -popularity)).astype(np.int64)
+
+
+class MappedCatalogIndex:
+    # CatalogIndex over the mapped columns: popularity lists are walked lazily from the
+    # precomputed order, and a category's order is sliced out on first use.
+    def __init__(self, catalog: MappedCatalog):
+        self.catalog = catalog
+        self.items = catalog.items
+        self._category_code = {c: i for i, c in enumerate(catalog.categories)}
+        self._by_category: Dict[int, "np.ndarray"] = {}
+
+    def __len__(self) -> int:
+        return len(self.catalog.popularity_order)
+
+    def _ranked(self, rows: "np.ndarray") -> Iterator[Ranked]:
+        c = self.catalog
+        for r in rows:
+            r = int(r)
+            yield c.item_ids[r], float(c.popularity[r]), r
+
+    def _category_rows(self, code: int) -> "np.ndarray":
+        rows = self._by_category.get(code)
+        if rows is None:
+            order = self.catalog.popularity_order
+            rows = self._by_category[code] = order[np.asarray(self.catalog.category)[order] == code]
+        return rows
+
+    def by_popularity(self) -> Iterator[Ranked]:
+        return self._ranked(self.catalog.popularity_order)
+
+    def merged_by_popularity(self, categories: List[str]) -> Iterator[Ranked]:
+        lists = [self._ranked(self._category_rows(self._category_code[c])) for c in categories if c in self._category_code]
+        if len(lists) == 1:
+            return lists[0]
+        return heapq.merge(*lists, key=_by_popularity)
+
+
+class MappedCooccurrenceIndex:
+    # CooccurrenceIndex over the CSR columns. A source's neighbour list is read from the
+    # mapped rows when a cart first asks for it and kept in a bounded LRU. Ranks are CSR
+    # positions, i.e. the order of MappedCatalog.cooccurrence().
+    def __init__(self, catalog: MappedCatalog, top_n: int | None = None, cache_size: int = 65536):
+        self.catalog = catalog
+        self.top_n = top_n
+        self._row = lru_cache(maxsize=cache_size)(self._load)
+
+    def __len__(self) -> int:
+        return len(self.catalog.cooc_data)
+
+    def _load(self, source: str) -> Tuple[List[Neighbor], Dict[str, float]]:
+        c = self.catalog
+        row = c.row(source)
+        if row < 0:
+            return [], {}
+        lo, hi = int(c.cooc_indptr[row]), int(c.cooc_indptr[row + 1])
+        # A repeated pair keeps its first position and its last strength, as in a dict.
+        first: Dict[int, int] = {}
+        strength: Dict[int, float] = {}
+        for pos, (b, value) in enumerate(zip(c.cooc_indices[lo:hi].tolist(), c.cooc_data[lo:hi].tolist()), lo):
+            first.setdefault(b, pos)
+            strength[b] = value
+        ordered = sorted(first, key=lambda b: (-strength[b], first[b]))[: self.top_n]
+        neighbors = [(c.item_ids[b], strength[b], first[b]) for b in ordered]
+        return neighbors, {b: s for b, s, _ in neighbors}
+
+    def neighbors(self, source: str) -> List[Neighbor]:
+        return self._row(source)[0]
+
+    def strength(self, source: str, target: str) -> float:
+        return self._row(source)[1].get(target, 0.0)
+
+
+def read_records(path: str) -> Iterator[Dict[str, str]]:
+    # Rows of a .csv (with header) or .jsonl file as dicts.
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def _truthy(value: object) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in {"1", "true", "yes", "y", "t"}
+    return bool(value)
+
+
+def _save_strings(root: Path, name: str, values: List[str], lookup: bool = True) -> None:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    np.save(root / f"{name}.bytes.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(root / f"{name}.offsets.npy", offsets)
+    if lookup:
+        order = sorted(range(len(encoded)), key=encoded.__getitem__)
+        np.save(root / f"{name}.sorted.npy", np.asarray(order, dtype=np.int64))
+
+
+def compile_catalog(
+    items: Iterable[Dict[str, object]],
+    cooccurrence: Iterable[Dict[str, object]],
+    out_dir: str,
+) -> Dict[str, int]:
+    # items: item_id, name, category, cuisine, price, veg, popularity[, restaurant_id]
+    # cooccurrence: source, target, strength
+    # The directory is written next to out_dir and swapped in at the end, so a reader never
+    # opens a half-written catalog.
+    _require_numpy()
+    ids: List[str] = []
+    names: List[str] = []
+    cat_codes: Dict[str, int] = {}
+    cuisine_codes: Dict[str, int] = {}
+    category: List[int] = []
+    cuisine: List[int] = []
+    price: List[int] = []
+    veg: List[bool] = []
+    popularity: List[float] = []
+    row_of: Dict[str, int] = {}
+    menus: Dict[str, List[int]] = {}
+    for rec in items:
+        iid = str(rec["item_id"])
+        if iid in row_of:
+            raise ValueError(f"duplicate item_id {iid!r}")
+        row_of[iid] = len(ids)
+        ids.append(iid)
+        names.append(str(rec.get("name", iid)))
+        category.append(cat_codes.setdefault(str(rec["category"]), len(cat_codes)))
+        cuisine.append(cuisine_codes.setdefault(str(rec["cuisine"]), len(cuisine_codes)))
+        price.append(int(rec["price"]))
+        veg.append(_truthy(rec["veg"]))
+        popularity.append(float(rec["popularity"]))
+        restaurant_id = rec.get("restaurant_id")
+        if restaurant_id not in (None, ""):
+            menus.setdefault(str(restaurant_id), []).append(row_of[iid])
+
+    rows: Dict[int, List[Tuple[int, float]]] = {}
+    n_pairs = 0
+    for rec in cooccurrence:
+        a, b = row_of.get(str(rec["source"])), row_of.get(str(rec["target"]))
+        if a is None or b is None:
+            continue
+        rows.setdefault(a, []).append((b, float(rec["strength"])))
+        n_pairs += 1
+
+    out = Path(out_dir)
+    tmp = out.with_name(out.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    _save_strings(tmp, "item_ids", ids)
+    _save_strings(tmp, "names", names, lookup=False)
+    np.save(tmp / "category.npy", np.asarray(category, dtype=np.int32))
+    np.save(tmp / "cuisine.npy", np.asarray(cuisine, dtype=np.int32))
+    np.save(tmp / "price.npy", np.asarray(price, dtype=np.int64))
+    np.save(tmp / "veg.npy", np.asarray(veg, dtype=bool))
+    np.save(tmp / "popularity.npy", np.asarray(popularity, dtype=np.float64))
+    np.save(tmp / "popularity_order.npy", _popularity_order(np.asarray(popularity, dtype=np.float64)))
+
+    restaurant_ids = list(menus)
+    _save_strings(tmp, "restaurant_ids", restaurant_ids)
+    menu_indptr = np.zeros(len(restaurant_ids) + 1, dtype=np.int64)
+    np.cumsum([len(menus[r]) for r in restaurant_ids], out=menu_indptr[1:])
+    np.save(tmp / "menu_indptr.npy", menu_indptr)
+    np.save(tmp / "menu_items.npy", np.asarray([i for r in restaurant_ids for i in menus[r]], dtype=np.int32))
+
+    cooc_indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum([len(rows.get(i, ())) for i in range(len(ids))], out=cooc_indptr[1:])
+    flat = [pair for i in range(len(ids)) for pair in rows.get(i, ())]
+    np.save(tmp / "cooc_indptr.npy", cooc_indptr)
+    np.save(tmp / "cooc_indices.npy", np.asarray([b for b, _ in flat], dtype=np.int32))
+    np.save(tmp / "cooc_data.npy", np.asarray([s for _, s in flat], dtype=np.float64))
+
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "categories": list(cat_codes),
+        "cuisines": list(cuisine_codes),
+        "items": len(ids),
+        "restaurants": len(restaurant_ids),
+        "pairs": n_pairs,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    old = out.with_name(out.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if out.exists():
+        out.rename(old)
+    tmp.rename(out)
+    shutil.rmtree(old, ignore_errors=True)
+    return {"items": len(ids), "restaurants": len(restaurant_ids), "pairs": n_pairs}
@@ -0,0 +1,46 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, List, Tuple, TypeVar
+
+# Chunked process-pool map shared by the offline pipelines (feature extraction, replay).
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    chunk: List[T] = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_chunks(
+    fn: Callable[[List[T]], R],
+    chunks: Iterable[List[T]],
+    *,
+    workers: int,
+    initializer: Callable[..., None],
+    initargs: Tuple = (),
+) -> Iterator[R]:
+    # Yields fn(chunk) in input order. With workers <= 1 everything runs in this process;
+    # otherwise at most 2 * workers chunks are in flight, so memory does not grow with the
+    # input. fn and initializer must be module-level so they pickle.
+    if workers <= 1:
+        initializer(*initargs)
+        for chunk in chunks:
+            yield fn(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as ex:
+        pending: Deque = deque()
+        for chunk in chunks:
+            pending.append(ex.submit(fn, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -4,9 +4,10 @@ from typing import Dict, List, Tuple
 
 from .config import CSAOConfig
 from .data import Item, RestaurantContext, UserProfile
-from .features import budget_fit_score, cart_value, context_score, user_preference_score
+from .features import CartContext, budget_fit_score, context_score, user_preference_score
+from .index import CooccurrenceIndex
 from .meal_graph import completion_gap_score
-from .ml_model import LogisticModel, train_logistic_sgd
+from .ml_model import LogisticModel, np, train_logistic_sgd
 
 
 @dataclass(frozen=True)
@@ -16,31 +17,48 @@ class RankedRecommendation:
     reason: str
 
 
-def _max_cooccurrence(cart_item_ids: List[str], candidate_id: str, cooccurrence_strength: Dict[Tuple[str, str], float]) -> float:
+def _max_cooccurrence(cart: CartContext, candidate_id: str, cooccurrence: CooccurrenceIndex) -> float:
     max_co = 0.0
-    for src in cart_item_ids:
-        max_co = max(max_co, cooccurrence_strength.get((src, candidate_id), 0.0))
+    for src in cart.item_ids:
+        max_co = max(max_co, cooccurrence.strength(src, candidate_id))
     return max_co
 
 
+FEATURE_NAMES = (
+    "max_cooccurrence",
+    "meal_completion",
+    "user_preference",
+    "budget_fit",
+    "popularity",
+    "context",
+    "is_main",
+    "is_side",
+    "is_dessert",
+    "is_beverage",
+    "reason_co_occurrence",
+    "reason_meal_completion",
+    "reason_popularity",
+)
+FEATURE_DIM = len(FEATURE_NAMES)
+
+
 def feature_vector(
     *,
-    cart_item_ids: List[str],
+    cart: CartContext,
     candidate_id: str,
     reason: str,
     items: Dict[str, Item],
     user: UserProfile,
     context: RestaurantContext,
     time_of_day: str,
-    cooccurrence_strength: Dict[Tuple[str, str], float],
+    cooccurrence: CooccurrenceIndex,
 ) -> List[float]:
     cand = items[candidate_id]
-    cart_total = cart_value(cart_item_ids, items)
 
-    max_co = _max_cooccurrence(cart_item_ids, candidate_id, cooccurrence_strength)
-    meal = completion_gap_score(cart_item_ids, candidate_id, items)
+    max_co = _max_cooccurrence(cart, candidate_id, cooccurrence)
+    meal = completion_gap_score(cart, candidate_id, items)
     pref = user_preference_score(user, cand)
-    budget = budget_fit_score(user, cart_total, cand)
+    budget = budget_fit_score(user, cart.total, cand)
     pop = cand.popularity
     ctx = context_score(context, cand, time_of_day)
 
@@ -79,6 +97,7 @@ def build_synthetic_training_rows(
     seed: int = 123,
 ) -> Tuple[List[List[float]], List[int]]:
     rnd = random.Random(seed)
+    cooccurrence = CooccurrenceIndex(cooccurrence_strength)
 
     contexts = [
         RestaurantContext("r_10", cuisine="hyderabadi", price_level="mid", city="Hyderabad"),
@@ -101,13 +120,14 @@ def build_synthetic_training_rows(
         cart_item_ids = [rnd.choice(mains)]
         if rnd.random() < 0.35:
             cart_item_ids.append(rnd.choice([iid for iid in item_ids if iid != cart_item_ids[0]]))
+        cart = CartContext.build(cart_item_ids, items)
 
         for candidate_id in item_ids:
-            if candidate_id in cart_item_ids:
+            if candidate_id in cart.item_set:
                 continue
 
-            max_co = _max_cooccurrence(cart_item_ids, candidate_id, cooccurrence_strength)
-            meal = completion_gap_score(cart_item_ids, candidate_id, items)
+            max_co = _max_cooccurrence(cart, candidate_id, cooccurrence)
+            meal = completion_gap_score(cart, candidate_id, items)
             pref = user_preference_score(user, items[candidate_id])
 
             accept_prob = 0.05 + 0.60 * max_co + 0.25 * meal + 0.10 * pref
@@ -116,14 +136,14 @@ def build_synthetic_training_rows(
 
             reason = "co_occurrence" if max_co > 0.0 else ("meal_completion" if meal > 0.0 else "popularity")
             x = feature_vector(
-                cart_item_ids=cart_item_ids,
+                cart=cart,
                 candidate_id=candidate_id,
                 reason=reason,
                 items=items,
                 user=user,
                 context=context,
                 time_of_day=time_of_day,
-                cooccurrence_strength=cooccurrence_strength,
+                cooccurrence=cooccurrence,
             )
             x_rows.append(x)
             y_rows.append(y)
@@ -147,34 +167,100 @@ def train_default_rank_model(
     return train_logistic_sgd(x_rows, y_rows)
 
 
-def rank_candidates(
-    cart_item_ids: List[str],
+def heuristic_rank_model(cfg: CSAOConfig) -> LogisticModel:
+    # Linear blend of the configured ranking weights; sigmoid keeps the order, so this ranks
+    # like the hand-tuned scorer until a trained model is available.
+    weights = [0.0] * FEATURE_DIM
+    weights[FEATURE_NAMES.index("max_cooccurrence")] = cfg.w_cooccurrence
+    weights[FEATURE_NAMES.index("meal_completion")] = cfg.w_meal_completion
+    weights[FEATURE_NAMES.index("user_preference")] = cfg.w_user_preference
+    weights[FEATURE_NAMES.index("budget_fit")] = cfg.w_budget_fit
+    weights[FEATURE_NAMES.index("popularity")] = cfg.w_popularity
+    weights[FEATURE_NAMES.index("context")] = cfg.w_context
+    return LogisticModel(weights=weights, bias=0.0)
+
+
+def _top_indices(scores: "np.ndarray", top_k: int | None) -> "np.ndarray":
+    # Descending by score, ties in input order -- same as a stable sort of the per-item path.
+    n = scores.shape[0]
+    idx = np.arange(n)
+    if top_k is not None and top_k < n:
+        if top_k <= 0:
+            return idx[:0]
+        kth = np.partition(-scores, top_k - 1)[top_k - 1]
+        idx = np.flatnonzero(-scores <= kth)
+    order = np.lexsort((idx, -scores[idx]))
+    return idx[order][:top_k]
+
+
+def candidate_rows(
+    cart: CartContext,
     candidate_with_reason: List[Tuple[str, str]],
     items: Dict[str, Item],
     user: UserProfile,
     context: RestaurantContext,
     time_of_day: str,
-    cooccurrence_strength: Dict[Tuple[str, str], float],
-    cfg: CSAOConfig,
-    model: LogisticModel,
-) -> List[RankedRecommendation]:
-    results: List[RankedRecommendation] = []
+    cooccurrence: CooccurrenceIndex,
+) -> Tuple[List[Tuple[str, str]], List[List[float]]]:
+    kept: List[Tuple[str, str]] = []
+    rows: List[List[float]] = []
     for item_id, reason in candidate_with_reason:
-        if item_id in cart_item_ids or item_id not in items:
+        if item_id in cart.item_set or item_id not in items:
             continue
 
         x = feature_vector(
-            cart_item_ids=cart_item_ids,
+            cart=cart,
             candidate_id=item_id,
             reason=reason,
             items=items,
             user=user,
             context=context,
             time_of_day=time_of_day,
-            cooccurrence_strength=cooccurrence_strength,
+            cooccurrence=cooccurrence,
         )
-        score = model.predict_proba(x)
-        results.append(RankedRecommendation(item_id=item_id, score=score, reason=reason))
+        kept.append((item_id, reason))
+        rows.append(x)
+    return kept, rows
+
+
+def order_scored(
+    kept: List[Tuple[str, str]],
+    scores: "np.ndarray | List[float]",
+    top_k: int | None = None,
+) -> List[RankedRecommendation]:
+    if np is not None and isinstance(scores, np.ndarray):
+        return [
+            RankedRecommendation(item_id=kept[i][0], score=float(scores[i]), reason=kept[i][1])
+            for i in _top_indices(scores, top_k)
+        ]
 
+    results = [
+        RankedRecommendation(item_id=item_id, score=score, reason=reason) for (item_id, reason), score in zip(kept, scores)
+    ]
     results.sort(key=lambda r: r.score, reverse=True)
-    return results
+    return results[:top_k]
+
+
+def score_rows(
+    model: LogisticModel, rows: "np.ndarray | List[List[float]]", vectorized: bool = True
+) -> "np.ndarray | List[float]":
+    if vectorized and np is not None and len(rows):
+        return model.predict_proba_batch(np.asarray(rows, dtype=np.float64))
+    return [model.predict_proba(x) for x in rows]
+
+
+def rank_candidates(
+    cart: CartContext,
+    candidate_with_reason: List[Tuple[str, str]],
+    items: Dict[str, Item],
+    user: UserProfile,
+    context: RestaurantContext,
+    time_of_day: str,
+    cooccurrence: CooccurrenceIndex,
+    cfg: CSAOConfig,
+    model: LogisticModel,
+    top_k: int | None = None,
+    vectorized: bool = True,
+) -> List[RankedRecommendation]:
+    kept, rows = candidate_rows(cart, candidate_with_reason, items, user, context, time_of_day, cooccurrence)
+    return order_scored(kept, score_rows(model, rows, vectorized), top_k)
@@ -0,0 +1,177 @@
+import math
+from dataclasses import dataclass, replace
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
+
+from .config import CSAOConfig
+from .data import Item, RestaurantContext, UserProfile
+from .engine import CSAOEngine, RecommendationRequest
+from .eval import ndcg_at_k, precision_at_k, recall_at_k
+from .parallel import chunked, run_chunks
+from .storage import FeedbackStore
+
+# (user_id, restaurant_id, city, time_of_day, cart_item_ids_csv), accepted item ids
+Session = Tuple[Tuple[str, str, str, str, str], List[str]]
+# metric name -> [sum, sum of squares] over sessions
+Sums = Dict[str, List[float]]
+
+# Per-process engines, one per arm, built once by _init_worker.
+_WORKER: Dict[str, object] = {}
+
+
+@dataclass(frozen=True)
+class Arm:
+    name: str
+    model_path: str
+    cfg: CSAOConfig
+
+
+def _init_worker(
+    arms: List[Arm],
+    items: Dict[str, Item] | None,
+    users: Dict[str, UserProfile],
+    cooccurrence: Dict[Tuple[str, str], float] | None,
+    menus: Dict[str, List[str]] | None,
+    catalog_path: str | None,
+    ks: Tuple[int, ...],
+) -> None:
+    engines = []
+    for arm in arms:
+        # Replays must be deterministic: no bandit exploration, and no cache since
+        # sessions are mostly distinct.
+        cfg = replace(arm.cfg, bandit_enabled=False, cache_enabled=False)
+        if catalog_path is not None:
+            engine = CSAOEngine.from_catalog_file(catalog_path, users, cfg, arm.model_path)
+        else:
+            engine = CSAOEngine(items, users, cooccurrence, cfg, arm.model_path, menus=menus)
+        engines.append((arm.name, engine))
+    _WORKER["engines"] = engines
+    _WORKER["ks"] = ks
+
+
+def _session_metrics(pred: List[str], truth: set, ks: Tuple[int, ...]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for k in ks:
+        out[f"precision@{k}"] = precision_at_k(pred, truth, k)
+        out[f"recall@{k}"] = recall_at_k(pred, truth, k)
+        out[f"ndcg@{k}"] = ndcg_at_k(pred, truth, k)
+        out[f"hit@{k}"] = 1.0 if any(x in truth for x in pred[:k]) else 0.0
+    return out
+
+
+def _add(sums: Sums, metrics: Dict[str, float]) -> None:
+    for name, v in metrics.items():
+        acc = sums.setdefault(name, [0.0, 0.0])
+        acc[0] += v
+        acc[1] += v * v
+
+
+def evaluate_sessions(sessions: List[Session]) -> Tuple[int, Dict[str, Sums], Dict[str, Sums]]:
+    # Returns (sessions, per-arm sums, per-arm sums of the paired difference to the first arm).
+    # Only sums leave the worker, so the parent holds O(arms x metrics) whatever the log size.
+    engines: List[Tuple[str, CSAOEngine]] = _WORKER["engines"]
+    ks: Tuple[int, ...] = _WORKER["ks"]
+    top_k = max(ks)
+
+    reqs: List[RecommendationRequest] = []
+    contexts: List[RestaurantContext] = []
+    for (user_id, restaurant_id, city, time_of_day, cart_csv), _ in sessions:
+        reqs.append(
+            RecommendationRequest(
+                user_id=user_id,
+                restaurant_id=restaurant_id,
+                city=city,
+                time_of_day=time_of_day,
+                cart_item_ids=[x for x in cart_csv.split(",") if x],
+                top_k=top_k,
+            )
+        )
+        # The log has no restaurant cuisine; use the same default as the feature pipeline.
+        contexts.append(RestaurantContext(restaurant_id=restaurant_id, cuisine="indian", price_level="mid", city=city))
+
+    per_arm: List[List[Dict[str, float]]] = []
+    for _, engine in engines:
+        responses = engine.recommend_batch(reqs, contexts)
+        per_arm.append(
+            [
+                _session_metrics([r["item_id"] for r in resp["recommendations"]], set(accepted), ks)
+                for resp, (_, accepted) in zip(responses, sessions)
+            ]
+        )
+
+    totals: Dict[str, Sums] = {name: {} for name, _ in engines}
+    deltas: Dict[str, Sums] = {name: {} for name, _ in engines[1:]}
+    for i in range(len(sessions)):
+        base = per_arm[0][i]
+        for (name, _), rows in zip(engines, per_arm):
+            _add(totals[name], rows[i])
+            if name in deltas:
+                _add(deltas[name], {m: v - base[m] for m, v in rows[i].items()})
+    return len(sessions), totals, deltas
+
+
+class ReplayTotals:
+    def __init__(self, arms: List[str]):
+        self.arms = arms
+        self.sessions = 0
+        self.totals: Dict[str, Sums] = {name: {} for name in arms}
+        self.deltas: Dict[str, Sums] = {name: {} for name in arms[1:]}
+
+    def merge(self, n: int, totals: Dict[str, Sums], deltas: Dict[str, Sums]) -> None:
+        self.sessions += n
+        for target, part in ((self.totals, totals), (self.deltas, deltas)):
+            for name, sums in part.items():
+                for metric, (s, sq) in sums.items():
+                    acc = target[name].setdefault(metric, [0.0, 0.0])
+                    acc[0] += s
+                    acc[1] += sq
+
+    def summary(self) -> Dict[str, object]:
+        # Means per arm; paired deltas against the first arm with a normal-approximation 95% CI.
+        n = self.sessions
+        out: Dict[str, object] = {
+            "sessions": n,
+            "arms": {name: {m: s / n for m, (s, _) in sorted(sums.items())} for name, sums in self.totals.items()},
+        }
+        if n and self.deltas:
+            deltas: Dict[str, Dict[str, Dict[str, float]]] = {}
+            for name, sums in self.deltas.items():
+                deltas[name] = {}
+                for metric, (s, sq) in sorted(sums.items()):
+                    mean = s / n
+                    var = max(sq / n - mean * mean, 0.0) * n / (n - 1) if n > 1 else 0.0
+                    deltas[name][metric] = {"delta": mean, "ci95": 1.96 * math.sqrt(var / n)}
+            out["vs_" + self.arms[0]] = deltas
+        return out
+
+
+def replay_evaluate(
+    store: FeedbackStore,
+    arms: List[Arm],
+    *,
+    items: Dict[str, Item] | None = None,
+    users: Dict[str, UserProfile],
+    cooccurrence: Dict[Tuple[str, str], float] | None = None,
+    menus: Dict[str, List[str]] | None = None,
+    catalog_path: str | None = None,
+    ks: Tuple[int, ...] = (8,),
+    workers: int = 1,
+    chunk_size: int = 2000,
+    max_sessions: int | None = None,
+) -> ReplayTotals:
+    # Every logged request context with at least one accept is reranked by each arm and
+    # scored against its accepted items. Sessions stream from SQLite in chunks; at most
+    # 2 * workers chunks are in flight.
+    if not arms:
+        raise ValueError("need at least one arm")
+    sessions: Iterator[Session] = store.iter_accepted_sessions(upto_id=store.max_event_id())
+    if max_sessions is not None:
+        sessions = islice(sessions, max_sessions)
+    result = ReplayTotals([arm.name for arm in arms])
+    initargs = (arms, items, users, cooccurrence, menus, catalog_path, tuple(sorted(set(ks))))
+
+    for part in run_chunks(
+        evaluate_sessions, chunked(sessions, chunk_size), workers=workers, initializer=_init_worker, initargs=initargs
+    ):
+        result.merge(*part)
+    return result
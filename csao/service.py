@@ -1,9 +1,16 @@
+import logging
+import sqlite3
+import threading
 from dataclasses import dataclass
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, List, Tuple
 
 from .data import RestaurantContext
 from .engine import CSAOEngine, RecommendationRequest
-from .storage import FeedbackStore
+from .storage import EventRow, FeedbackStore
+from .tracing import SamplingProfiler
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -16,8 +23,42 @@ class CSAOService:
     def __init__(self, engine: CSAOEngine, store: FeedbackStore):
         self.engine = engine
         self.store = store
+        self._snapshot_stop = threading.Event()
+        self._snapshot_thread: threading.Thread | None = None
+        self.profiler = SamplingProfiler()
+        engine.metrics.gauge("csao_store_queue_depth", "Feedback batches waiting for the writer", store.queue_depth)
 
-    def recommend(self, payload: Dict[str, object]) -> Dict[str, object]:
+    def warm_start_bandit(self) -> None:
+        self.engine.bandit.restore(self.store.load_bandit_state())
+
+    def start_bandit_snapshots(self, interval_s: float = 60.0) -> None:
+        if self._snapshot_thread is not None:
+            return
+
+        def loop() -> None:
+            while not self._snapshot_stop.wait(interval_s):
+                try:
+                    self.store.snapshot_bandit_state()
+                except sqlite3.Error:
+                    # e.g. "database is locked"; the next interval folds the same events.
+                    logger.exception("bandit snapshot failed")
+
+        self._snapshot_thread = threading.Thread(target=loop, name="csao-bandit-snapshot", daemon=True)
+        self._snapshot_thread.start()
+
+    def close(self) -> None:
+        self.engine.stop_model_watch()
+        self._snapshot_stop.set()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+            self._snapshot_thread = None
+        self.engine.enable_tracing(None)
+        self.store.flush()
+        self.store.snapshot_bandit_state()
+        self.store.close()
+
+    @staticmethod
+    def _parse(payload: Dict[str, object]) -> Tuple[RecommendationRequest, RestaurantContext]:
         req = RecommendationRequest(
             user_id=str(payload["user_id"]),
             restaurant_id=str(payload["restaurant_id"]),
@@ -32,24 +73,79 @@ class CSAOService:
             price_level=str(payload.get("restaurant_price_level", "mid")),
             city=req.city,
         )
+        return req, context
 
-        response = self.engine.recommend(req, context)
-
-        # Log impressions for future retraining.
+    @staticmethod
+    def _impression_rows(req: RecommendationRequest, response: Dict[str, object]) -> List[EventRow]:
         cart_csv = ",".join(req.cart_item_ids)
-        for rec in response["recommendations"]:
-            self.store.log_event(
-                user_id=req.user_id,
-                restaurant_id=req.restaurant_id,
-                city=req.city,
-                time_of_day=req.time_of_day,
-                cart_item_ids_csv=cart_csv,
-                item_id=rec["item_id"],
-                reason=rec["reason"],
-                accepted=False,
-            )
-
-        return response
+        return [
+            (req.user_id, req.restaurant_id, req.city, req.time_of_day, cart_csv, rec["item_id"], rec["reason"], 0)
+            for rec in response["recommendations"]
+        ]
+
+    def recommend(self, payload: Dict[str, object]) -> Dict[str, object]:
+        with self.engine.span("service.recommend"):
+            req, context = self._parse(payload)
+            response = self.engine.recommend(req, context)
+
+            # Log impressions for future retraining; written behind the request by the store.
+            with self.engine.stage("feedback_log"):
+                self.store.log_events(self._impression_rows(req, response))
+            return response
+
+    def recommend_batch(self, payload: Dict[str, object]) -> Dict[str, object]:
+        with self.engine.span("service.recommend_batch"):
+            parsed = [self._parse(p) for p in payload["requests"]]
+            reqs = [req for req, _ in parsed]
+            responses = self.engine.recommend_batch(reqs, [ctx for _, ctx in parsed])
+
+            rows: List[EventRow] = []
+            for req, response in zip(reqs, responses):
+                rows.extend(self._impression_rows(req, response))
+            with self.engine.stage("feedback_log"):
+                self.store.log_events(rows)
+            return {"results": responses}
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "cache": self.engine.cache.stats(),
+            "catalog": self.engine.shards.stats(),
+            "model_version": self.engine.model_version,
+        }
+
+    def metrics(self) -> str:
+        return self.engine.metrics.render()
+
+    def profile(self, payload: Dict[str, object]) -> Dict[str, object]:
+        # Starts a bounded background profile; the collapsed stacks land in the profiler's
+        # out_dir under the returned file name. Non-finite or non-positive values raise
+        # ValueError from start() (a 400).
+        duration_s = float(payload.get("duration_s", 10.0))
+        interval_s = float(payload.get("interval_ms", 5.0)) / 1000.0
+        path = self.profiler.start(duration_s, interval_s)
+        duration_s = min(max(duration_s, 0.01), self.profiler.max_duration_s)
+        return {"ok": True, "file": Path(path).name, "duration_s": duration_s}
+
+    def _model_path(self, requested: object) -> str | None:
+        # Clients may only pick artifacts next to the configured model, never arbitrary files.
+        if not requested:
+            return None
+        configured = self.engine.model_path
+        if not configured:
+            raise ValueError("no model path configured")
+        model_dir = Path(configured).resolve().parent
+        # Either a path from the working directory or a bare name inside the model directory.
+        for path in (Path(str(requested)).resolve(), (model_dir / str(requested)).resolve()):
+            if path.parent == model_dir and path.suffix == ".json":
+                return str(path)
+        raise ValueError("model path must be a .json file in the model directory")
+
+    def reload_model(self, payload: Dict[str, object]) -> Dict[str, object]:
+        version = self.engine.reload_model(self._model_path(payload.get("path")))
+        return {"ok": True, "model_version": version}
+
+    def rollback_model(self) -> Dict[str, object]:
+        return {"ok": True, "model_version": self.engine.rollback_model()}
 
     def accept(self, payload: Dict[str, object]) -> Dict[str, object]:
         user_id = str(payload["user_id"])
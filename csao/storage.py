@@ -1,11 +1,164 @@
+import atexit
+import logging
+import queue
 import sqlite3
+import threading
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Tuple
+
+from .bandit import BanditState
+
+logger = logging.getLogger(__name__)
+
+# user_id, restaurant_id, city, time_of_day, cart_item_ids, item_id, reason, accepted
+EventRow = Tuple[str, str, str, str, str, str, str, int]
+
+# Repeated strings (users, restaurants, cities, time buckets, items, reasons) are stored
+# once in feedback_strings, and each distinct cart once in feedback_carts; events keep ids.
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS feedback_strings (
+        id INTEGER PRIMARY KEY,
+        value TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS feedback_carts (
+        id INTEGER PRIMARY KEY,
+        item_ids TEXT NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS feedback_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        restaurant_id INTEGER NOT NULL,
+        city INTEGER NOT NULL,
+        time_of_day INTEGER NOT NULL,
+        cart_id INTEGER NOT NULL,
+        item_id INTEGER NOT NULL,
+        reason INTEGER NOT NULL,
+        accepted INTEGER NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Covers the per-item impression/accept aggregates (bandit warm start, evaluation).
+    "CREATE INDEX IF NOT EXISTS ix_feedback_events_item ON feedback_events(item_id, accepted)",
+    # Accepted events in request-context order, so replay groups sessions off the index
+    # instead of sorting; partial, so impressions (most writes) never touch it.
+    """
+    CREATE INDEX IF NOT EXISTS ix_feedback_events_accepted_session
+    ON feedback_events(user_id, restaurant_id, city, time_of_day, cart_id) WHERE accepted = 1
+    """,
+    # No reader filters on created_at; databases created before this only paid for it on insert.
+    "DROP INDEX IF EXISTS ix_feedback_events_created",
+    # Decoded view with the original column layout, used by every reader.
+    """
+    CREATE VIEW IF NOT EXISTS feedback_event_rows AS
+    SELECT
+        e.id AS id,
+        u.value AS user_id,
+        r.value AS restaurant_id,
+        c.value AS city,
+        t.value AS time_of_day,
+        k.item_ids AS cart_item_ids,
+        i.value AS item_id,
+        rs.value AS reason,
+        e.accepted AS accepted,
+        e.created_at AS created_at
+    FROM feedback_events e
+    JOIN feedback_strings u ON u.id = e.user_id
+    JOIN feedback_strings r ON r.id = e.restaurant_id
+    JOIN feedback_strings c ON c.id = e.city
+    JOIN feedback_strings t ON t.id = e.time_of_day
+    JOIN feedback_carts k ON k.id = e.cart_id
+    JOIN feedback_strings i ON i.id = e.item_id
+    JOIN feedback_strings rs ON rs.id = e.reason
+    """,
+]
+
+_MAX_ID = (1 << 63) - 1
+
+_INSERT_EVENT = """
+    INSERT INTO feedback_events(
+        user_id, restaurant_id, city, time_of_day, cart_id,
+        item_id, reason, accepted
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _is_legacy(conn: sqlite3.Connection) -> bool:
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(feedback_events)")}
+    return "cart_item_ids" in cols
+
+
+def migrate_feedback_db(db_path: str) -> int:
+    # Converts a database written with the original all-TEXT feedback_events layout.
+    # Event ids are preserved so bandit and training watermarks stay valid.
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        if not _is_legacy(conn):
+            return 0
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("ALTER TABLE feedback_events RENAME TO feedback_events_legacy")
+        for stmt in _SCHEMA:
+            conn.execute(stmt)
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO feedback_strings(value)
+            SELECT user_id FROM feedback_events_legacy
+            UNION SELECT restaurant_id FROM feedback_events_legacy
+            UNION SELECT city FROM feedback_events_legacy
+            UNION SELECT time_of_day FROM feedback_events_legacy
+            UNION SELECT item_id FROM feedback_events_legacy
+            UNION SELECT reason FROM feedback_events_legacy
+            """
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO feedback_carts(item_ids) SELECT DISTINCT cart_item_ids FROM feedback_events_legacy"
+        )
+        moved = conn.execute(
+            """
+            INSERT INTO feedback_events(
+                id, user_id, restaurant_id, city, time_of_day, cart_id, item_id, reason, accepted, created_at
+            )
+            SELECT l.id, u.id, r.id, c.id, t.id, k.id, i.id, rs.id, l.accepted, l.created_at
+            FROM feedback_events_legacy l
+            JOIN feedback_strings u ON u.value = l.user_id
+            JOIN feedback_strings r ON r.value = l.restaurant_id
+            JOIN feedback_strings c ON c.value = l.city
+            JOIN feedback_strings t ON t.value = l.time_of_day
+            JOIN feedback_carts k ON k.item_ids = l.cart_item_ids
+            JOIN feedback_strings i ON i.value = l.item_id
+            JOIN feedback_strings rs ON rs.value = l.reason
+            ORDER BY l.id
+            """
+        ).rowcount
+        conn.execute("DROP TABLE feedback_events_legacy")
+        conn.execute("COMMIT")
+        conn.execute("VACUUM")
+        return moved
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
 
 
 class FeedbackStore:
-    def __init__(self, db_path: str = "artifacts/csao.db"):
+    def __init__(self, db_path: str = "artifacts/csao.db", *, queue_size: int = 10000, batch_size: int = 500):
         self.db_path = db_path
+        self.batch_size = batch_size
+        self.dropped_events = 0
+        # Each queue entry is one log_events() call; its rows always commit in one transaction.
+        self._queue: "queue.Queue[List[EventRow] | None]" = queue.Queue(maxsize=queue_size)
+        self._writer: threading.Thread | None = None
+        self._writer_lock = threading.Lock()
+        # Set when the writer thread stops on an unexpected error; raised once by the next
+        # log_events() or flush(), after which a fresh writer is started.
+        self._writer_error: BaseException | None = None
+        self._atexit_registered = False
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self._init_db()
 
@@ -14,19 +167,31 @@ class FeedbackStore:
 
     def _init_db(self) -> None:
         with self._connect() as conn:
+            # WAL lets readers (snapshots, retraining) run alongside the background writer.
+            conn.execute("PRAGMA journal_mode=WAL")
+            if _is_legacy(conn):
+                raise RuntimeError(
+                    f"{self.db_path} uses the legacy feedback_events layout; "
+                    "convert it with `python migrate_feedback_db.py` first"
+                )
+            for stmt in _SCHEMA:
+                conn.execute(stmt)
+            # Per-item bandit counts folded from feedback_events up to last_event_id.
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS bandit_snapshot (
+                    item_id TEXT PRIMARY KEY,
+                    impressions INTEGER NOT NULL,
+                    accepts INTEGER NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS feedback_events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    restaurant_id TEXT NOT NULL,
-                    city TEXT NOT NULL,
-                    time_of_day TEXT NOT NULL,
-                    cart_item_ids TEXT NOT NULL,
-                    item_id TEXT NOT NULL,
-                    reason TEXT NOT NULL,
-                    accepted INTEGER NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                CREATE TABLE IF NOT EXISTS bandit_snapshot_meta (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    last_event_id INTEGER NOT NULL,
+                    saved_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
                 """
             )
@@ -44,36 +209,322 @@ class FeedbackStore:
         reason: str,
         accepted: bool,
     ) -> None:
-        with self._connect() as conn:
-            conn.execute(
-                """
-                INSERT INTO feedback_events(
-                    user_id, restaurant_id, city, time_of_day, cart_item_ids,
-                    item_id, reason, accepted
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    user_id,
-                    restaurant_id,
-                    city,
-                    time_of_day,
-                    cart_item_ids_csv,
-                    item_id,
-                    reason,
-                    1 if accepted else 0,
-                ),
-            )
-            conn.commit()
+        self.log_events(
+            [(user_id, restaurant_id, city, time_of_day, cart_item_ids_csv, item_id, reason, 1 if accepted else 0)]
+        )
+
+    def log_events(self, rows: List[EventRow]) -> None:
+        # Rows are handed to the background writer; put() blocks only when the queue is full.
+        if not rows:
+            return
+        self._check_writer()
+        self._ensure_writer()
+        self._queue.put(list(rows))
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        if self._writer is None:
+            return
+        self._check_writer()
+        self._ensure_writer()
+        self._queue.join()
+        self._check_writer()
+
+    def close(self) -> None:
+        with self._writer_lock:
+            writer = self._writer
+            if writer is None:
+                return
+            if writer.is_alive():
+                self._queue.put(None)
+                writer.join()
+            self._writer = None
+
+    def _check_writer(self) -> None:
+        error, self._writer_error = self._writer_error, None
+        if error is not None:
+            raise RuntimeError("feedback writer failed; queued events were dropped") from error
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            self._writer = threading.Thread(target=self._write_loop, name="csao-feedback-writer", daemon=True)
+            self._writer.start()
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def _write_loop(self) -> None:
+        try:
+            self._write_batches()
+        except Exception as exc:
+            # Nothing drains the queue any more: drop what is queued so flush() and blocked
+            # log_events() callers return, and let the next caller see the error.
+            logger.exception("feedback writer stopped")
+            self._writer_error = exc
+            while True:
+                try:
+                    entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.dropped_events += len(entry or [])
+                self._queue.task_done()
+
+    def _write_batches(self) -> None:
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Dictionary ids seen by this writer; it is the only thread that inserts them.
+        string_ids: Dict[str, int] = {}
+        cart_ids: Dict[str, int] = {}
+        try:
+            stop = False
+            while not stop:
+                batch = [self._queue.get()]
+                n_rows = len(batch[0] or [])
+                while n_rows < self.batch_size:
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batch.append(entry)
+                    n_rows += len(entry or [])
+
+                rows = [row for entry in batch if entry is not None for row in entry]
+                stop = any(entry is None for entry in batch)
+                try:
+                    if rows:
+                        try:
+                            conn.execute("BEGIN")
+                            encoded = [self._encode(conn, row, string_ids, cart_ids) for row in rows]
+                            conn.executemany(_INSERT_EVENT, encoded)
+                            conn.execute("COMMIT")
+                        except Exception:
+                            # A bad batch (database error or malformed row) is dropped, not fatal.
+                            if conn.in_transaction:
+                                conn.execute("ROLLBACK")
+                            # Ids interned inside the rolled-back transaction no longer exist.
+                            string_ids.clear()
+                            cart_ids.clear()
+                            self.dropped_events += len(rows)
+                            logger.exception("dropped %d feedback events", len(rows))
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _encode(
+        conn: sqlite3.Connection, row: EventRow, string_ids: Dict[str, int], cart_ids: Dict[str, int]
+    ) -> Tuple[int, ...]:
+        user_id, restaurant_id, city, time_of_day, cart_csv, item_id, reason, accepted = row
 
-    def fetch_training_rows(self, limit: int = 50000) -> List[Tuple[str, str, str, str, str, str, str, int]]:
+        def intern(value: str) -> int:
+            sid = string_ids.get(value)
+            if sid is None:
+                conn.execute("INSERT OR IGNORE INTO feedback_strings(value) VALUES (?)", (value,))
+                sid = conn.execute("SELECT id FROM feedback_strings WHERE value = ?", (value,)).fetchone()[0]
+                string_ids[value] = sid
+            return sid
+
+        cid = cart_ids.get(cart_csv)
+        if cid is None:
+            conn.execute("INSERT OR IGNORE INTO feedback_carts(item_ids) VALUES (?)", (cart_csv,))
+            cid = conn.execute("SELECT id FROM feedback_carts WHERE item_ids = ?", (cart_csv,)).fetchone()[0]
+            cart_ids[cart_csv] = cid
+
+        return (
+            intern(user_id),
+            intern(restaurant_id),
+            intern(city),
+            intern(time_of_day),
+            cid,
+            intern(item_id),
+            intern(reason),
+            accepted,
+        )
+
+    def fetch_training_rows(self, limit: int = 50000) -> List[EventRow]:
         with self._connect() as conn:
             rows = conn.execute(
                 """
                 SELECT user_id, restaurant_id, city, time_of_day, cart_item_ids, item_id, reason, accepted
-                FROM feedback_events
+                FROM feedback_event_rows
                 ORDER BY id DESC
                 LIMIT ?
                 """,
                 (limit,),
             ).fetchall()
         return rows
+
+    def iter_training_rows(
+        self, after_id: int = 0, chunk_size: int = 2000, upto_id: int | None = None
+    ) -> Iterator[Tuple[int, EventRow]]:
+        # Streams (id, row) in id order from a cursor instead of materializing the result.
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                """
+                SELECT id, user_id, restaurant_id, city, time_of_day, cart_item_ids, item_id, reason, accepted
+                FROM feedback_event_rows
+                WHERE id > ? AND id <= ?
+                ORDER BY id
+                """,
+                (after_id, upto_id if upto_id is not None else _MAX_ID),
+            )
+            while True:
+                chunk = cur.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                for row in chunk:
+                    yield row[0], row[1:]
+        finally:
+            conn.close()
+
+    def iter_accepted(self, chunk_size: int = 5000) -> Iterator[Tuple[str, str]]:
+        # (cart_item_ids_csv, item_id) of accepted events, streamed in id order.
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                """
+                SELECT cart_item_ids, item_id
+                FROM feedback_event_rows
+                WHERE accepted = 1
+                ORDER BY id
+                """
+            )
+            while True:
+                chunk = cur.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                yield from chunk
+        finally:
+            conn.close()
+
+    def iter_accepted_sessions(
+        self, upto_id: int | None = None, chunk_size: int = 5000
+    ) -> Iterator[Tuple[Tuple[str, str, str, str, str], List[str]]]:
+        # ((user_id, restaurant_id, city, time_of_day, cart_item_ids), accepted item ids) per
+        # request context. Impressions and accepts of one request share these columns; the
+        # ordering on the dictionary ids lets SQLite group on disk instead of in memory here.
+        conn = self._connect()
+        try:
+            cur = conn.execute(
+                """
+                SELECT e.user_id, e.restaurant_id, e.city, e.time_of_day, e.cart_id,
+                       u.value, r.value, c.value, t.value, k.item_ids, i.value
+                FROM feedback_events e
+                JOIN feedback_strings u ON u.id = e.user_id
+                JOIN feedback_strings r ON r.id = e.restaurant_id
+                JOIN feedback_strings c ON c.id = e.city
+                JOIN feedback_strings t ON t.id = e.time_of_day
+                JOIN feedback_carts k ON k.id = e.cart_id
+                JOIN feedback_strings i ON i.id = e.item_id
+                WHERE e.accepted = 1 AND e.id <= ?
+                ORDER BY e.user_id, e.restaurant_id, e.city, e.time_of_day, e.cart_id, e.id
+                """,
+                (upto_id if upto_id is not None else _MAX_ID,),
+            )
+            key = None
+            session: Tuple[str, str, str, str, str] | None = None
+            accepted: List[str] = []
+            while True:
+                chunk = cur.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                for row in chunk:
+                    if row[:5] != key:
+                        if session is not None:
+                            yield session, accepted
+                        key, session, accepted = row[:5], row[5:10], []
+                    if row[10] not in accepted:
+                        accepted.append(row[10])
+            if session is not None:
+                yield session, accepted
+        finally:
+            conn.close()
+
+    def max_event_id(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM feedback_events").fetchone()[0]
+
+    def window_start_id(self, n: int) -> int:
+        # Watermark that leaves exactly the newest n events after it (0 if there are fewer).
+        with self._connect() as conn:
+            row = conn.execute("SELECT id FROM feedback_events ORDER BY id DESC LIMIT 1 OFFSET ?", (n,)).fetchone()
+        return row[0] if row else 0
+
+    def count_events(self, after_id: int = 0, upto_id: int | None = None) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM feedback_events WHERE id > ? AND id <= ?",
+                (after_id, upto_id if upto_id is not None else _MAX_ID),
+            ).fetchone()[0]
+
+    def snapshot_bandit_state(self) -> int:
+        # Folds only the events logged since the previous snapshot, so the cost of a
+        # snapshot tracks the snapshot interval rather than the size of the log.
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = self._snapshot_watermark(conn)
+            new_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM feedback_events").fetchone()[0]
+            if new_id > last_id:
+                conn.execute(
+                    """
+                    INSERT INTO bandit_snapshot(item_id, impressions, accepts)
+                    SELECT s.value, SUM(1 - e.accepted), SUM(e.accepted)
+                    FROM feedback_events e
+                    JOIN feedback_strings s ON s.id = e.item_id
+                    WHERE e.id > ? AND e.id <= ?
+                    GROUP BY e.item_id
+                    ON CONFLICT(item_id) DO UPDATE SET
+                        impressions = impressions + excluded.impressions,
+                        accepts = accepts + excluded.accepts
+                    """,
+                    (last_id, new_id),
+                )
+                conn.execute(
+                    """
+                    INSERT INTO bandit_snapshot_meta(id, last_event_id) VALUES (0, ?)
+                    ON CONFLICT(id) DO UPDATE SET last_event_id = excluded.last_event_id, saved_at = CURRENT_TIMESTAMP
+                    """,
+                    (new_id,),
+                )
+            conn.commit()
+        return new_id
+
+    def load_bandit_state(self) -> BanditState:
+        # Snapshot plus the aggregate of whatever was logged after it.
+        state = BanditState()
+        with self._connect() as conn:
+            last_id = self._snapshot_watermark(conn)
+            for item_id, impressions, accepts in conn.execute(
+                "SELECT item_id, impressions, accepts FROM bandit_snapshot"
+            ):
+                state.impressions[item_id] = impressions
+                state.accepts[item_id] = accepts
+            for item_id, impressions, accepts in conn.execute(
+                """
+                SELECT s.value, SUM(1 - e.accepted), SUM(e.accepted)
+                FROM feedback_events e
+                JOIN feedback_strings s ON s.id = e.item_id
+                WHERE e.id > ?
+                GROUP BY e.item_id
+                """,
+                (last_id,),
+            ):
+                state.impressions[item_id] = state.impressions.get(item_id, 0) + impressions
+                state.accepts[item_id] = state.accepts.get(item_id, 0) + accepts
+        state.impressions = {k: v for k, v in state.impressions.items() if v}
+        state.accepts = {k: v for k, v in state.accepts.items() if v}
+        return state
+
+    @staticmethod
+    def _snapshot_watermark(conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT last_event_id FROM bandit_snapshot_meta WHERE id = 0").fetchone()
+        return row[0] if row else 0
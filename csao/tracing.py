@@ -0,0 +1,221 @@
+import json
+import logging
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Dict, List
+
+from .metrics import Histogram
+
+
+class _NoopSpan:
+    # Stands in for a span when tracing is off so call sites need no branches.
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        pass
+
+    def set(self, **attrs: object) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "children", "start", "duration", "hist", "parent")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict[str, object], hist: Histogram | None):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.children: List["Span"] = []
+        self.hist = hist
+        self.duration = 0.0
+
+    def set(self, **attrs: object) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.parent = self.tracer._push(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: object, *exc: object) -> None:
+        self.duration = time.perf_counter() - self.start
+        if self.hist is not None:
+            self.hist.observe(self.duration, self.name)
+        if exc_type is not None:
+            self.attrs["error"] = getattr(exc_type, "__name__", str(exc_type))
+        self.tracer._pop(self)
+
+    def to_dict(self, origin: float) -> Dict[str, object]:
+        out: Dict[str, object] = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+        }
+        if self.attrs:
+            out["attrs"] = self.attrs
+        if self.children:
+            out["children"] = [c.to_dict(origin) for c in self.children]
+        return out
+
+
+class Tracer:
+    # Opt-in request tracing. Every request on a traced path builds a span tree; it is
+    # written only if the request was sampled (sample_rate) or ran longer than slow_ms.
+    # Output is one JSON object per line in a size-rotated file.
+    def __init__(
+        self,
+        path: str = "artifacts/traces/csao_traces.jsonl",
+        *,
+        sample_rate: float = 0.0,
+        slow_ms: float | None = None,
+        max_bytes: int = 10 << 20,
+        backups: int = 5,
+    ):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self._local = threading.local()
+        self.written = 0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._log = logging.getLogger(f"csao.traces.{id(self)}")
+        self._log.propagate = False
+        self._log.setLevel(logging.INFO)
+        self._log.addHandler(self._handler)
+
+    def span(self, name: str, hist: Histogram | None = None, **attrs: object) -> Span:
+        return Span(self, name, attrs, hist)
+
+    def _push(self, span: Span) -> Span | None:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1] if stack else None
+        if parent is not None:
+            parent.children.append(span)
+        stack.append(span)
+        return parent
+
+    def _pop(self, span: Span) -> None:
+        stack = self._local.stack
+        stack.pop()
+        if span.parent is None:
+            self._finish(span)
+
+    def _finish(self, root: Span) -> None:
+        duration_ms = root.duration * 1000
+        if self.slow_ms is not None and duration_ms >= self.slow_ms:
+            reason = "slow"
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            reason = "sampled"
+        else:
+            return
+        record = {
+            "ts": time.time(),
+            "reason": reason,
+            "thread": threading.current_thread().name,
+            "duration_ms": round(duration_ms, 3),
+            "root": root.to_dict(root.start),
+        }
+        self._log.info(json.dumps(record, default=str))
+        self.written += 1
+
+    def close(self) -> None:
+        self._log.removeHandler(self._handler)
+        self._handler.close()
+
+
+def _frame_stack(frame: object) -> List[str]:
+    out: List[str] = []
+    while frame is not None:
+        code = frame.f_code
+        out.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    out.reverse()
+    return out
+
+
+class SamplingProfiler:
+    # Wall-clock sampler for the live process: every interval it walks the stack of each
+    # other thread and counts identical stacks. Output is Brendan Gregg's collapsed format
+    # ("thread;outer;...;inner count"), the input of flamegraph.pl / speedscope.
+    # One run at a time, and never longer than max_duration_s.
+    def __init__(self, out_dir: str = "artifacts/profiles", max_duration_s: float = 120.0):
+        self.out_dir = out_dir
+        self.max_duration_s = max_duration_s
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self.last_path: str | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration_s: float = 10.0, interval_s: float = 0.005) -> str:
+        # Output always goes under out_dir with a generated name; callers never choose the path.
+        if not (math.isfinite(duration_s) and duration_s > 0):
+            raise ValueError("duration_s must be a positive number")
+        if not (math.isfinite(interval_s) and interval_s > 0):
+            raise ValueError("interval must be a positive number")
+        duration_s = min(max(duration_s, 0.01), self.max_duration_s)
+        interval_s = min(max(interval_s, 0.001), duration_s)
+        with self._lock:
+            if self.running:
+                raise RuntimeError("a profile is already running")
+            out_dir = Path(self.out_dir)
+            out_dir.mkdir(parents=True, exist_ok=True)
+            stem = time.strftime("profile-%Y%m%d-%H%M%S")
+            path = str(out_dir / f"{stem}.folded")
+            n = 1
+            while os.path.exists(path):
+                path = str(out_dir / f"{stem}-{n}.folded")
+                n += 1
+            self._thread = threading.Thread(
+                target=self._run, args=(duration_s, interval_s, path), name="csao-profiler", daemon=True
+            )
+            self._thread.start()
+            return path
+
+    def wait(self, timeout: float | None = None) -> bool:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.running
+
+    def _run(self, duration_s: float, interval_s: float, path: str) -> None:
+        me = threading.get_ident()
+        names = {}
+        stacks: Counter = Counter()
+        deadline = time.monotonic() + duration_s
+        while time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if len(names) != len(frames):
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                stacks[";".join([names.get(ident, str(ident))] + _frame_stack(frame))] += 1
+            del frames
+            time.sleep(max(0.0, min(interval_s, deadline - time.monotonic())))
+
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp, path)
+        self.last_path = path
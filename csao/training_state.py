@@ -0,0 +1,118 @@
+import json
+import random
+import sqlite3
+from array import array
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+from .ml_model import LogisticModel
+
+
+def _pack(x: List[float]) -> bytes:
+    return array("d", x).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    a = array("d")
+    a.frombytes(blob)
+    return a.tolist()
+
+
+# Retraining checkpoint: feedback watermark, last weights and materialized features.
+# Writes become visible together on commit(), so an interrupted run never advances the
+# watermark past features it did not store.
+class TrainingState:
+    def __init__(self, path: str = "artifacts/csao_train_state.db"):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS train_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                last_event_id INTEGER NOT NULL,
+                model_json TEXT
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS train_features (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id INTEGER NOT NULL,
+                x BLOB NOT NULL,
+                y INTEGER NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @property
+    def last_event_id(self) -> int:
+        row = self._conn.execute("SELECT last_event_id FROM train_meta WHERE id = 0").fetchone()
+        return row[0] if row else 0
+
+    def model(self) -> LogisticModel | None:
+        row = self._conn.execute("SELECT model_json FROM train_meta WHERE id = 0").fetchone()
+        if not row or row[0] is None:
+            return None
+        return LogisticModel.from_dict(json.loads(row[0]))
+
+    def append(self, rows: List[Tuple[int, List[float], int]]) -> None:
+        self._conn.executemany(
+            "INSERT INTO train_features(event_id, x, y) VALUES (?, ?, ?)",
+            [(event_id, _pack(x), y) for event_id, x, y in rows],
+        )
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM train_features").fetchone()[0]
+
+    def iter_features(self, chunk_size: int = 5000) -> Iterator[Tuple[List[float], int]]:
+        cur = self._conn.execute("SELECT x, y FROM train_features ORDER BY seq")
+        while True:
+            chunk = cur.fetchmany(chunk_size)
+            if not chunk:
+                break
+            for blob, y in chunk:
+                yield _unpack(blob), y
+
+    def max_seq(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM train_features").fetchone()[0]
+
+    def sample(self, n: int, *, max_seq: int, rnd: random.Random) -> Tuple[List[List[float]], List[int]]:
+        # seq is gap-free except at the pruned front, so random seqs hit rows without a scan.
+        lo = self._conn.execute("SELECT MIN(seq) FROM train_features").fetchone()[0]
+        hi = max_seq
+        if lo is None or lo > hi or n <= 0:
+            return [], []
+        seqs = rnd.sample(range(lo, hi + 1), min(n, hi - lo + 1))
+        x_rows: List[List[float]] = []
+        y_rows: List[int] = []
+        for i in range(0, len(seqs), 500):
+            part = seqs[i : i + 500]
+            marks = ",".join("?" * len(part))
+            for blob, y in self._conn.execute(f"SELECT x, y FROM train_features WHERE seq IN ({marks})", part):
+                x_rows.append(_unpack(blob))
+                y_rows.append(y)
+        return x_rows, y_rows
+
+    def commit(self, *, last_event_id: int, model: LogisticModel | None, keep: int) -> None:
+        model_json = json.dumps(model.to_dict()) if model is not None else None
+        self._conn.execute(
+            """
+            INSERT INTO train_meta(id, last_event_id, model_json) VALUES (0, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                last_event_id = excluded.last_event_id,
+                model_json = COALESCE(excluded.model_json, train_meta.model_json)
+            """,
+            (last_event_id, model_json),
+        )
+        # Keep only the newest `keep` materialized rows, mirroring the old LIMIT 50000 window.
+        self._conn.execute(
+            "DELETE FROM train_features WHERE seq <= (SELECT MAX(seq) FROM train_features) - ?",
+            (keep,),
+        )
+        self._conn.commit()
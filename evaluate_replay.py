@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import time
+from dataclasses import replace
+
+from csao import CSAOConfig
+from csao.data import sample_cooccurrence, sample_items, sample_users
+from csao.replay_eval import Arm, replay_evaluate
+from csao.storage import FeedbackStore
+
+
+def _arm(name: str, model_path: str, overrides: str | None) -> Arm:
+    # overrides is a JSON object of CSAOConfig fields, e.g. '{"candidate_pool_size": 80}'.
+    if not os.path.exists(model_path):
+        raise SystemExit(f"model artifact not found: {model_path}")
+    cfg = replace(CSAOConfig(), **json.loads(overrides)) if overrides else CSAOConfig()
+    return Arm(name=name, model_path=model_path, cfg=cfg)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay logged sessions through two rankers and compare them")
+    parser.add_argument("--db", default="artifacts/csao.db", help="Feedback database")
+    parser.add_argument("--model-a", default="artifacts/csao_logistic.json", help="Baseline model artifact")
+    parser.add_argument("--model-b", default=None, help="Candidate model artifact (default: same as --model-a)")
+    parser.add_argument("--config-a", default=None, help="JSON CSAOConfig overrides for the baseline")
+    parser.add_argument("--config-b", default=None, help="JSON CSAOConfig overrides for the candidate")
+    parser.add_argument("--catalog", default=None, help="compile_catalog.py output to replay against (default: sample catalog)")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 8], help="Cutoffs for precision/recall/ndcg/hit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Replay processes")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Sessions per task")
+    parser.add_argument("--max-sessions", type=int, default=None)
+    parser.add_argument("--out", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    if args.model_b is None and args.config_b is None:
+        arms = [_arm("a", args.model_a, args.config_a)]
+    else:
+        arms = [_arm("a", args.model_a, args.config_a), _arm("b", args.model_b or args.model_a, args.config_b)]
+
+    store = FeedbackStore(args.db)
+    t0 = time.perf_counter()
+    if args.catalog:
+        totals = replay_evaluate(
+            store, arms, users=sample_users(), catalog_path=args.catalog,
+            ks=tuple(args.k), workers=args.workers, chunk_size=args.chunk_size, max_sessions=args.max_sessions,
+        )
+    else:
+        totals = replay_evaluate(
+            store, arms, items=sample_items(), users=sample_users(), cooccurrence=sample_cooccurrence(),
+            ks=tuple(args.k), workers=args.workers, chunk_size=args.chunk_size, max_sessions=args.max_sessions,
+        )
+    elapsed = time.perf_counter() - t0
+    summary = totals.summary()
+
+    print(f"Replayed {summary['sessions']} sessions with accepts in {elapsed:.1f}s ({args.workers} workers)")
+    metrics = sorted(next(iter(summary["arms"].values()), {}))
+    deltas = summary.get("vs_a", {}).get("b", {})
+    header = f"{'metric':<14}" + "".join(f"{arm.name:>10}" for arm in arms)
+    print(header + (f"{'b - a':>12}{'95% CI':>10}" if deltas else ""))
+    for metric in metrics:
+        line = f"{metric:<14}" + "".join(f"{summary['arms'][arm.name][metric]:>10.4f}" for arm in arms)
+        if deltas:
+            d = deltas[metric]
+            line += f"{d['delta']:>+12.4f}{d['ci95']:>10.4f}"
+        print(line)
+
+    if args.out:
+        report = {
+            "db": args.db,
+            "catalog": args.catalog,
+            "arms": {
+                arm.name: {"model": arm.model_path, "config": json.loads(c) if c else {}}
+                for arm, c in zip(arms, [args.config_a, args.config_b])
+            },
+            "elapsed_s": elapsed,
+            **summary,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import argparse
+
+from csao.storage import migrate_feedback_db
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert feedback_events to the dictionary-encoded layout")
+    parser.add_argument("db", nargs="*", default=["artifacts/csao.db"], help="SQLite database path(s)")
+    args = parser.parse_args()
+
+    for path in args.db:
+        moved = migrate_feedback_db(path)
+        if moved:
+            print(f"{path}: migrated {moved} events")
+        else:
+            print(f"{path}: already up to date")
+
+
+if __name__ == "__main__":
+    main()
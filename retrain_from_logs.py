@@ -1,61 +1,119 @@
-from csao.data import RestaurantContext, sample_cooccurrence, sample_items, sample_users
-from csao.ml_model import train_logistic_sgd
-from csao.ranker import feature_vector
+import argparse
+import os
+import random
+
+from csao.data import sample_cooccurrence, sample_items, sample_users
+from csao.eval import EvalAccumulator
+from csao.feature_pipeline import extract_features
+from csao.ml_model import np, train_logistic_newton, train_logistic_sgd
 from csao.storage import FeedbackStore
+from csao.training_state import TrainingState
+
+WINDOW = 50000
+MIN_ROWS = 50
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Retrain CSAO ranker from feedback logs")
+    parser.add_argument("--state", default="artifacts/csao_train_state.db", help="Training checkpoint path")
+    parser.add_argument("--full", action="store_true", help="Ignore previous weights and train on the whole window")
+    parser.add_argument(
+        "--solver",
+        choices=["newton", "sgd"],
+        default="newton" if np is not None else "sgd",
+        help="newton needs numpy; sgd is the pure-Python trainer",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Feature extraction processes")
+    parser.add_argument("--mmap", default=None, help="Write new feature rows to this .npy memmap instead of RAM")
+    args = parser.parse_args()
+
     items = sample_items()
     users = sample_users()
-    cooc = sample_cooccurrence()
     store = FeedbackStore("artifacts/csao.db")
+    state = TrainingState(args.state)
 
-    rows = store.fetch_training_rows(limit=50000)
-    if len(rows) < 50:
-        print("Not enough feedback rows yet. Need at least 50.")
-        return
+    prev_event_id = state.last_event_id
+    if prev_event_id == 0:
+        # First run: only the newest WINDOW events can survive commit(keep=WINDOW), so
+        # featurizing anything older would be thrown away.
+        prev_event_id = store.window_start_id(WINDOW)
+    prev_max_seq = state.max_seq()
+    feats = extract_features(
+        store,
+        prev_event_id,
+        items=items,
+        users=users,
+        cooccurrence=sample_cooccurrence(),
+        workers=args.workers,
+        out_path=args.mmap,
+    )
+    last_event_id = feats.last_event_id
+    new_x = feats.x.tolist() if np is not None and args.solver == "sgd" else feats.x
+    new_y = [int(y) for y in feats.y]
 
-    x_rows = []
-    y_rows = []
-
-    for user_id, restaurant_id, city, time_of_day, cart_csv, item_id, reason, accepted in rows:
-        if item_id not in items:
-            continue
-        user = users.get(user_id)
-        if user is None:
-            # skip unknown users for now; can be replaced with user feature store lookup
-            continue
-
-        cart_item_ids = [x for x in cart_csv.split(",") if x in items]
-        context = RestaurantContext(
-            restaurant_id=restaurant_id,
-            cuisine="indian",
-            price_level="mid",
-            city=city,
+    for i in range(0, len(feats), 5000):
+        ids = feats.event_ids[i : i + 5000]
+        state.append(
+            [(int(event_id), list(x), y) for event_id, x, y in zip(ids, new_x[i : i + 5000], new_y[i : i + 5000])]
         )
 
-        x = feature_vector(
-            cart_item_ids=cart_item_ids,
-            candidate_id=item_id,
-            reason=reason,
-            items=items,
-            user=user,
-            context=context,
-            time_of_day=time_of_day,
-            cooccurrence_strength=cooc,
+    def train(x_rows, y_rows, init=None):
+        if args.solver == "newton":
+            return train_logistic_newton(x_rows, y_rows, l2=1e-4, seed=7, init=init)
+        return train_logistic_sgd(x_rows, y_rows, epochs=250, lr=0.05, l2=1e-4, seed=7, init=init)
+
+    prev_model = None if args.full else state.model()
+    if prev_model is not None and new_y:
+        # Progressive validation: the previous model has not seen these rows yet.
+        holdout = EvalAccumulator()
+        for i in range(0, len(new_y), 5000):
+            xs = new_x[i : i + 5000]
+            if isinstance(xs, list):
+                probs = [prev_model.predict_proba(x) for x in xs]
+            else:
+                probs = prev_model.predict_proba_batch(xs)
+            holdout.update(new_y[i : i + 5000], probs)
+        print(
+            f"Previous model on new rows: AUC={holdout.auc():.4f} "
+            f"log_loss={holdout.log_loss():.4f} ECE={holdout.expected_calibration_error():.4f}"
         )
-        x_rows.append(x)
-        y_rows.append(int(accepted))
+    total = state.count()
+    model = None
+    if total < MIN_ROWS:
+        print(f"Not enough usable rows yet ({total}). Need at least {MIN_ROWS}.")
+    elif prev_model is not None and not new_y:
+        print("No new feedback since the last retrain.")
+    elif prev_model is not None:
+        # Warm start on the new rows plus an equally sized replay sample of older ones,
+        # so work scales with new data without forgetting the rest of the window.
+        rnd = random.Random(7)
+        replay_x, replay_y = state.sample(len(new_y), max_seq=prev_max_seq, rnd=rnd)
+        if isinstance(new_x, list):
+            x_rows = new_x + replay_x
+        else:
+            x_rows = np.vstack([new_x, np.asarray(replay_x, dtype=np.float64).reshape(-1, new_x.shape[1])])
+        y_rows = new_y + replay_y
+        model = train(x_rows, y_rows, init=prev_model)
+    else:
+        x_rows, y_rows = [], []
+        for x, y in state.iter_features():
+            x_rows.append(x)
+            y_rows.append(y)
+        # The window is pruned on commit, so bound it here too on the first run.
+        x_rows, y_rows = x_rows[-WINDOW:], y_rows[-WINDOW:]
+        model = train(x_rows, y_rows)
+
+    state.commit(last_event_id=last_event_id, model=model, keep=WINDOW)
+    state.close()
 
-    if len(x_rows) < 50:
-        print("Not enough usable rows after filtering.")
+    if model is None:
         return
 
-    model = train_logistic_sgd(x_rows, y_rows, epochs=250, lr=0.05, l2=1e-4, seed=7)
     model.save("artifacts/csao_logistic.json")
 
     pos = sum(y_rows)
-    print(f"Trained on {len(y_rows)} rows, positives={pos}, negatives={len(y_rows)-pos}")
+    print(f"Trained on {len(y_rows)} rows ({len(new_y)} new), positives={pos}, negatives={len(y_rows)-pos}")
+    print(f"Consumed feedback events up to id {last_event_id}")
     print("Saved model: artifacts/csao_logistic.json")
 
 
@@ -0,0 +1,70 @@
+import random
+import threading
+
+import pytest
+
+from csao.bandit import UCBBandit
+
+ITEM_IDS = [f"i_{n}" for n in range(40)]
+
+
+def _hammer(bandit, n_threads, per_thread):
+    # Each thread logs a seeded random sequence and returns the counts it logged.
+    barrier = threading.Barrier(n_threads)
+    results = []
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        impressions, accepts = {}, {}
+        barrier.wait()
+        for _ in range(per_thread):
+            iid = rnd.choice(ITEM_IDS)
+            bandit.log_impression(iid)
+            impressions[iid] = impressions.get(iid, 0) + 1
+            if rnd.random() < 0.3:
+                bandit.log_accept(iid)
+                accepts[iid] = accepts.get(iid, 0) + 1
+            if rnd.random() < 0.05:
+                bandit.score_boosts(ITEM_IDS)
+        results.append((impressions, accepts))
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+@pytest.mark.parametrize("stripes", [1, 16])
+def test_concurrent_logging_keeps_exact_counts(stripes):
+    bandit = UCBBandit(stripes=stripes)
+    n_threads, per_thread = 16, 5000
+    results = _hammer(bandit, n_threads, per_thread)
+
+    expected_imp, expected_acc = {}, {}
+    for impressions, accepts in results:
+        for iid, n in impressions.items():
+            expected_imp[iid] = expected_imp.get(iid, 0) + n
+        for iid, n in accepts.items():
+            expected_acc[iid] = expected_acc.get(iid, 0) + n
+
+    state = bandit.state
+    assert state.impressions == expected_imp
+    assert state.accepts == expected_acc
+    assert bandit.total_impressions() == n_threads * per_thread
+
+    boosts = bandit.score_boosts(ITEM_IDS + ["unseen"])
+    assert [float(b) for b in boosts] == pytest.approx([bandit.score_boost(iid) for iid in ITEM_IDS + ["unseen"]])
+
+
+def test_restore_round_trip():
+    bandit = UCBBandit()
+    _hammer(bandit, 4, 1000)
+    copy = UCBBandit(stripes=3)
+    copy.restore(bandit.state)
+    assert copy.state == bandit.state
+    assert copy.total_impressions() == bandit.total_impressions()
+    assert [float(b) for b in copy.score_boosts(ITEM_IDS)] == pytest.approx(
+        [float(b) for b in bandit.score_boosts(ITEM_IDS)]
+    )
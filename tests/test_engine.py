@@ -0,0 +1,39 @@
+import pytest
+
+from csao.data import sample_cooccurrence, sample_items, sample_users
+from csao.engine import CSAOEngine
+from csao.ml_model import LogisticModel
+from csao.ranker import FEATURE_DIM
+
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / "model.json"
+    LogisticModel(weights=[0.1] * FEATURE_DIM, bias=0.0).save(str(path))
+    engine = CSAOEngine(sample_items(), sample_users(), sample_cooccurrence(), model_path=str(path))
+    yield engine
+    engine.stop_model_watch()
+
+
+def test_reloading_the_served_model_is_a_no_op(engine):
+    version = engine.model_version
+    generation = engine._scorer[0]
+    assert engine.reload_model() == version
+    assert engine._scorer[0] == generation
+    # Nothing was replaced, so there is nothing to roll back to.
+    with pytest.raises(ValueError):
+        engine.rollback_model()
+
+
+def test_repeated_reloads_keep_rollback_targets(engine, tmp_path):
+    a = engine.model_version
+    other = tmp_path / "other.json"
+    LogisticModel(weights=[-0.1] * FEATURE_DIM, bias=0.5).save(str(other))
+    b = engine.reload_model(str(other))
+    assert b != a
+    for _ in range(10):
+        assert engine.reload_model(str(other)) == b
+
+    assert engine.rollback_model() == a
+    with pytest.raises(ValueError):
+        engine.rollback_model()
@@ -0,0 +1,117 @@
+import math
+import random
+
+import pytest
+
+import csao.eval
+from csao.eval import EvalAccumulator, auc_score, calibration_buckets, log_loss
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    # Runs a test against both the NumPy path and the pure-Python fallback.
+    if request.param == "numpy":
+        if csao.eval.np is None:
+            pytest.skip("numpy not installed")
+    else:
+        monkeypatch.setattr(csao.eval, "np", None)
+    return request.param
+
+
+def _pairwise_auc(y, s):
+    # Reference definition: share of (positive, negative) pairs ranked correctly, ties 1/2.
+    pos = [v for v, t in zip(s, y) if t == 1]
+    neg = [v for v, t in zip(s, y) if t != 1]
+    if not pos or not neg:
+        return 0.5
+    wins = sum(1.0 if p > n else 0.5 if p == n else 0.0 for p in pos for n in neg)
+    return wins / (len(pos) * len(neg))
+
+
+def _cases():
+    rnd = random.Random(25)
+    cases = [
+        ([1, 0], [0.2, 0.2]),
+        ([1, 1, 0, 0], [0.9, 0.1, 0.5, 0.1]),
+        ([1, 1, 1], [0.1, 0.2, 0.3]),
+        ([0, 0], [0.4, 0.6]),
+    ]
+    for n, levels in ((50, 3), (200, 7), (500, 20), (300, 1000)):
+        grid = [rnd.random() for _ in range(levels)]
+        s = [rnd.choice(grid) for _ in range(n)]
+        y = [1 if rnd.random() < v else 0 for v in s]
+        cases.append((y, s))
+    return cases
+
+
+@pytest.mark.parametrize("y,s", _cases())
+def test_auc_score_matches_pairwise(backend, y, s):
+    assert auc_score(y, s) == pytest.approx(_pairwise_auc(y, s), abs=1e-12)
+
+
+def test_accumulator_auc_exact_on_bin_grid(backend):
+    # Scores that are already bin values lose nothing to binning.
+    rnd = random.Random(1)
+    bins = 64
+    s = [(rnd.randrange(bins) + 0.5) / bins for _ in range(2000)]
+    y = [1 if rnd.random() < v else 0 for v in s]
+    acc = EvalAccumulator(auc_bins=bins)
+    acc.update(y, s)
+    assert acc.auc() == pytest.approx(_pairwise_auc(y, s), abs=1e-12)
+
+
+def test_accumulator_auc_error_bounded_by_shared_bins(backend):
+    # Binning can only turn a pair inside one bin into a tie, so the error is at most half
+    # the share of (positive, negative) pairs that land in the same bin.
+    rnd = random.Random(2)
+    bins = 32
+    s = [rnd.random() for _ in range(1500)]
+    y = [1 if rnd.random() < v else 0 for v in s]
+    acc = EvalAccumulator(auc_bins=bins)
+    acc.update(y, s)
+    n_pos = sum(y)
+    n_neg = len(y) - n_pos
+    shared = sum(p * n for p, n in zip(acc.pos_hist, acc.neg_hist)) / (n_pos * n_neg)
+    assert 0 < shared < 0.1
+    assert abs(acc.auc() - _pairwise_auc(y, s)) <= 0.5 * shared + 1e-12
+
+
+def test_accumulator_chunks_and_merge_match_single_pass(backend):
+    rnd = random.Random(3)
+    s = [rnd.random() for _ in range(3000)]
+    y = [1 if rnd.random() < v else 0 for v in s]
+    whole = EvalAccumulator()
+    whole.update(y, s)
+    left, right = EvalAccumulator(), EvalAccumulator()
+    for i in range(0, len(s), 700):
+        (left if i % 1400 == 0 else right).update(y[i : i + 700], s[i : i + 700])
+    left.merge(right)
+    assert left.count == whole.count
+    assert left.auc() == pytest.approx(whole.auc(), abs=1e-12)
+    assert left.log_loss() == pytest.approx(whole.log_loss(), rel=1e-9)
+    assert len(left.calibration()) == len(whole.calibration())
+    for a, b in zip(left.calibration(), whole.calibration()):
+        assert a == pytest.approx(b)
+    assert whole.log_loss() == pytest.approx(log_loss(y, s), rel=1e-9)
+
+
+def test_log_loss(backend):
+    y = [1, 0, 1, 0]
+    p = [0.9, 0.2, 0.6, 0.4]
+    expected = -(math.log(0.9) + math.log(0.8) + math.log(0.6) + math.log(0.6)) / 4
+    assert log_loss(y, p) == pytest.approx(expected, rel=1e-12)
+    # Probabilities of exactly 0 or 1 are clipped instead of producing inf.
+    assert math.isfinite(log_loss([1, 0], [0.0, 1.0]))
+    assert log_loss([], []) == 0.0
+
+
+def test_calibration_buckets(backend):
+    rnd = random.Random(4)
+    p = [rnd.random() for _ in range(1000)] + [0.0, 1.0, 0.5]
+    y = [1 if rnd.random() < v else 0 for v in p]
+    table = calibration_buckets(y, p, n_buckets=10)
+    assert sum(b["count"] for b in table) == len(p)
+    for b in table:
+        assert b["lower"] <= b["mean_pred"] <= b["upper"]
+        assert 0.0 <= b["positive_rate"] <= 1.0
+    assert [b["lower"] for b in table] == sorted(b["lower"] for b in table)
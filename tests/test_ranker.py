@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from csao.config import CSAOConfig
+from csao.data import RestaurantContext, sample_cooccurrence, sample_items, sample_users
+from csao.features import CartContext
+from csao.index import CooccurrenceIndex
+from csao.ml_model import LogisticModel, np
+from csao.ranker import FEATURE_DIM, rank_candidates, train_default_rank_model
+
+pytestmark = pytest.mark.skipif(np is None, reason="the vectorized path needs numpy")
+
+ITEMS = sample_items()
+USERS = sample_users()
+COOC = sample_cooccurrence()
+INDEX = CooccurrenceIndex(COOC)
+CFG = CSAOConfig()
+CONTEXT = RestaurantContext(restaurant_id="r_10", cuisine="hyderabadi", price_level="mid", city="Hyderabad")
+
+
+def _rank(model, cart_ids, candidates, top_k, vectorized):
+    return rank_candidates(
+        CartContext.build(cart_ids, ITEMS),
+        candidates,
+        ITEMS,
+        USERS["u_1"],
+        CONTEXT,
+        "dinner",
+        INDEX,
+        CFG,
+        model,
+        top_k=top_k,
+        vectorized=vectorized,
+    )
+
+
+def _assert_same(model, cart_ids, candidates, top_k):
+    fast = _rank(model, cart_ids, candidates, top_k, True)
+    slow = _rank(model, cart_ids, candidates, top_k, False)
+    assert [(r.item_id, r.reason) for r in fast] == [(r.item_id, r.reason) for r in slow]
+    assert [r.score for r in fast] == pytest.approx([r.score for r in slow], abs=1e-12)
+
+
+@pytest.fixture(scope="module")
+def trained_model():
+    return train_default_rank_model(items=ITEMS, users=USERS, cooccurrence_strength=COOC)
+
+
+@pytest.mark.parametrize("top_k", [None, 0, 1, 3, 8, 100])
+def test_trained_model_parity(trained_model, top_k):
+    model = trained_model
+    rnd = random.Random(top_k or 0)
+    ids = list(ITEMS)
+    for _ in range(50):
+        cart = rnd.sample(ids, rnd.randint(1, 3))
+        candidates = [(iid, rnd.choice(["cooccurrence", "meal_graph", "popular"])) for iid in ids]
+        rnd.shuffle(candidates)
+        _assert_same(model, cart, candidates, top_k)
+
+
+@pytest.mark.parametrize("top_k", [None, 1, 2, 5])
+def test_all_tied_keeps_input_order(top_k):
+    # Zero weights give every candidate the same score; both paths keep input order.
+    model = LogisticModel(weights=[0.0] * FEATURE_DIM, bias=0.3)
+    candidates = [(iid, "popular") for iid in reversed(list(ITEMS))]
+    _assert_same(model, ["m_biryani"], candidates, top_k)
+    ranked = _rank(model, ["m_biryani"], candidates, top_k, True)
+    kept = [iid for iid, _ in candidates if iid != "m_biryani"]
+    assert [r.item_id for r in ranked] == kept[:top_k]
+
+
+@pytest.mark.parametrize("top_k", [None, 1, 3, 6, 7])
+def test_partial_ties_across_cut(top_k):
+    # A single categorical feature carries weight, so candidates fall into a few tied
+    # groups and a top_k cut can land inside a group.
+    weights = [0.0] * FEATURE_DIM
+    weights[2] = 1.0
+    model = LogisticModel(weights=weights, bias=0.0)
+    candidates = [(iid, "popular") for iid in ITEMS]
+    _assert_same(model, ["m_biryani"], candidates, top_k)
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from csao.storage import FeedbackStore
+
+ROW = ("u_1", "r_10", "Hyderabad", "dinner", "m_biryani", "m_raita", "cooccurrence", 1)
+
+
+def _within(fn, timeout=10.0):
+    # Runs fn in a thread so a regression shows up as a failure instead of a hung suite.
+    outcome = {}
+
+    def run():
+        try:
+            outcome["value"] = fn()
+        except BaseException as exc:
+            outcome["error"] = exc
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    t.join(timeout)
+    assert not t.is_alive(), f"{fn} did not return within {timeout}s"
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome.get("value")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FeedbackStore(str(tmp_path / "feedback.db"), queue_size=4)
+    yield store
+    store.close()
+
+
+def test_malformed_batch_is_dropped_and_writer_keeps_going(store):
+    store.log_events([("not", "an", "event")])
+    _within(store.flush)
+    assert store.dropped_events == 1
+
+    store.log_events([ROW, ROW])
+    _within(store.flush)
+    assert store.count_events() == 2
+
+
+def test_writer_crash_is_raised_instead_of_hanging(store, monkeypatch):
+    def boom():
+        raise OSError("disk went away")
+
+    monkeypatch.setattr(store, "_write_batches", boom)
+    store.log_events([ROW])
+    with pytest.raises(RuntimeError) as info:
+        _within(store.flush)
+    assert isinstance(info.value.__cause__, OSError)
+    assert store.dropped_events == 1
+
+    # More events than the queue holds must not block request threads forever.
+    def log_many():
+        for _ in range(20):
+            try:
+                store.log_events([ROW])
+            except RuntimeError:
+                pass
+
+    _within(log_many)
+
+    # Once the cause is gone, and the last crash has been reported, writing works again.
+    monkeypatch.undo()
+    try:
+        _within(store.flush)
+    except RuntimeError:
+        pass
+    _within(store.flush)
+    before = store.count_events()
+    store.log_events([ROW])
+    _within(store.flush)
+    assert store.count_events() == before + 1
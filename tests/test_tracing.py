@@ -0,0 +1,30 @@
+import os
+import time
+
+import pytest
+
+from csao.tracing import SamplingProfiler
+
+
+@pytest.mark.parametrize(
+    "duration_s,interval_s",
+    [(float("nan"), 0.005), (1.0, float("nan")), (float("inf"), 0.005), (1.0, float("inf")), (0.0, 0.005), (1.0, -1.0)],
+)
+def test_start_rejects_non_finite_or_non_positive_values(tmp_path, duration_s, interval_s):
+    profiler = SamplingProfiler(out_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        profiler.start(duration_s, interval_s)
+    assert not profiler.running
+    assert not os.listdir(tmp_path)
+
+
+def test_long_interval_still_ends_at_the_deadline(tmp_path):
+    profiler = SamplingProfiler(out_dir=str(tmp_path))
+    t0 = time.monotonic()
+    path = profiler.start(0.2, 3600.0)
+    assert profiler.wait(timeout=5.0)
+    assert time.monotonic() - t0 < 5.0
+    assert os.path.exists(path)
+    # The slot is free again for the next profile.
+    profiler.start(0.05, 0.01)
+    assert profiler.wait(timeout=5.0)
@@ -1,32 +1,30 @@
+import argparse
+
 from csao.data import sample_cooccurrence, sample_items, sample_users
-from csao.ranker import build_synthetic_training_rows
+from csao.engine import DEFAULT_MODEL_PATH
+from csao.eval import auc_score, log_loss
+from csao.ranker import build_synthetic_training_rows, train_default_rank_model
 from csao.ml_model import train_logistic_sgd
 
 
-def auc_score(y_true: list[int], y_score: list[float]) -> float:
-    pos = [(s, y) for s, y in zip(y_score, y_true) if y == 1]
-    neg = [(s, y) for s, y in zip(y_score, y_true) if y == 0]
-    if not pos or not neg:
-        return 0.5
-
-    wins = 0.0
-    total = 0.0
-    neg_scores = [s for s, _ in neg]
-    for ps, _ in pos:
-        for ns in neg_scores:
-            total += 1.0
-            if ps > ns:
-                wins += 1.0
-            elif ps == ns:
-                wins += 0.5
-    return wins / total if total else 0.5
-
-
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Train CSAO ranker on synthetic data")
+    parser.add_argument(
+        "--default-artifact",
+        action="store_true",
+        help="Rebuild the packaged startup model used when no trained artifact exists",
+    )
+    args = parser.parse_args()
+
     items = sample_items()
     users = sample_users()
     cooc = sample_cooccurrence()
 
+    if args.default_artifact:
+        train_default_rank_model(items=items, users=users, cooccurrence_strength=cooc).save(str(DEFAULT_MODEL_PATH))
+        print(f"Saved default model: {DEFAULT_MODEL_PATH}")
+        return
+
     x_rows, y_rows = build_synthetic_training_rows(
         items=items,
         users=users,
@@ -43,6 +41,7 @@ def main() -> None:
 
     probs = [model.predict_proba(x) for x in x_test]
     auc = auc_score(y_test, probs)
+    loss = log_loss(y_test, probs)
 
     out = "artifacts/csao_logistic.json"
     model.save(out)
@@ -50,6 +49,7 @@ def main() -> None:
     print(f"Trained rows: {len(x_train)}")
     print(f"Test rows: {len(x_test)}")
     print(f"Test AUC: {auc:.4f}")
+    print(f"Test log-loss: {loss:.4f}")
     print(f"Saved model: {out}")
 
 